@@ -0,0 +1,6 @@
+"""
+CLI to return the Ubuntu AMIs in the AWS quickstart and marketplace listings.
+"""
+from aws_marketplace_ubuntu_scraper.cli import main
+
+__all__ = ["main"]
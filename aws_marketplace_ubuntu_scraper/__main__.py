@@ -0,0 +1,6 @@
+import sys
+
+from aws_marketplace_ubuntu_scraper.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Describe the AMIs of the quickstart listings in batches and enrich the
+listings with the attributes parsed from their names.
+"""
+import json
+import os
+import re
+
+from botocore.exceptions import ClientError as botocoreClientError
+
+from aws_marketplace_ubuntu_scraper.names import parse_ami_name
+from aws_marketplace_ubuntu_scraper.timing import timed
+
+# Quickstart list keys holding the AMI ID for each listing architecture
+QUICKSTART_IMAGE_ID_KEYS = (("imageId64", "amd64"), ("imageIdArm64", "arm64"))
+# Maximum number of image IDs sent in a single describe_images call
+DESCRIBE_IMAGES_BATCH_SIZE = 100
+
+
+def describe_images_batched(region_client, ami_ids, batch_size=DESCRIBE_IMAGES_BATCH_SIZE):
+    """
+    Describe all ``ami_ids`` using as few ``describe_images`` calls as possible.
+
+    Returns a dict of AMI ID to ``describe_images`` image record. AMI IDs which
+    are missing, malformed or deregistered are left out of the returned dict.
+    """
+    unique_ami_ids = list(dict.fromkeys(ami_ids))
+    images = {}
+    for batch_start in range(0, len(unique_ami_ids), batch_size):
+        _describe_images_batch(
+            region_client, unique_ami_ids[batch_start:batch_start + batch_size], images
+        )
+    return images
+
+
+def _describe_images_batch(region_client, ami_ids, images):
+    try:
+        resp = region_client.describe_images(ImageIds=ami_ids)
+    except botocoreClientError as bce:
+        error = bce.response.get("Error", {})
+        if not error.get("Code", "").startswith("InvalidAMIID"):
+            raise
+        # One or more of the AMIs no longer exist (or never did). EC2 fails the
+        # whole call in this case so retry without the AMIs named in the error
+        # message, or split the batch when the message does not name them.
+        invalid_ami_ids = set(re.findall(r"ami-\w+", error.get("Message", "")))
+        remaining_ami_ids = [ami_id for ami_id in ami_ids if ami_id not in invalid_ami_ids]
+        if invalid_ami_ids and len(remaining_ami_ids) < len(ami_ids):
+            if remaining_ami_ids:
+                _describe_images_batch(region_client, remaining_ami_ids, images)
+        elif len(ami_ids) > 1:
+            middle = len(ami_ids) // 2
+            _describe_images_batch(region_client, ami_ids[:middle], images)
+            _describe_images_batch(region_client, ami_ids[middle:], images)
+        return
+    for image in resp.get("Images", []):
+        images[image["ImageId"]] = image
+
+
+class RecordedEc2Client:
+    """
+    Stand in for an EC2 client describing AMIs from recorded
+    ``describe_images`` responses rather than the EC2 API.
+    """
+
+    def __init__(self, images):
+        self.images = {image["ImageId"]: image for image in images}
+
+    @classmethod
+    def factory(cls, path):
+        """
+        Return a function returning the client of a region given a directory
+        of ``{region}.json`` describe_images responses, or a single response
+        used for every region.
+        """
+        def load(response_path):
+            with open(response_path) as response_file:
+                return cls(json.load(response_file).get("Images", []))
+
+        if not os.path.isdir(path):
+            client = load(path)
+            return lambda region_identifier: client
+
+        def region_client(region_identifier):
+            response_path = os.path.join(path, "{}.json".format(region_identifier))
+            return load(response_path) if os.path.exists(response_path) else cls([])
+
+        return region_client
+
+    def describe_images(self, ImageIds):
+        return {"Images": [self.images[ami_id] for ami_id in ImageIds if ami_id in self.images]}
+
+
+def get_ami_details(ami, quickstart_slot, ami_id, image_details):
+    if image_details:
+        image_owner, attrs = image_details
+        ami["quickstart_slot"] = quickstart_slot
+        ami["ami_id"] = ami_id
+        ami["owner"] = image_owner
+        for key, value in attrs.items():
+            ami[key] = value
+        return ami
+    else:
+        return None
+
+
+def resolve_ami_details(region_identifier, region_client, ami_ids, ami_cache=None):
+    """
+    Return a dict of AMI ID to the ``parse_ami_name`` details of each of
+    ``ami_ids`` which exists, using ``ami_cache`` where possible.
+    """
+    ami_details = {}
+    if ami_cache:
+        for ami_id, (image, image_details) in ami_cache.get_many(region_identifier, ami_ids).items():
+            ami_details[ami_id] = image_details
+    uncached_ami_ids = [ami_id for ami_id in ami_ids if ami_id not in ami_details]
+    if uncached_ami_ids:
+        images = describe_images_batched(region_client, uncached_ami_ids)
+        records = {}
+        for ami_id, image in images.items():
+            image_details = parse_ami_name(image)
+            ami_details[ami_id] = image_details
+            records[ami_id] = (image, image_details)
+        if ami_cache:
+            ami_cache.put_many(region_identifier, records)
+    return ami_details
+
+
+def get_ubuntu_quickstart_listings(
+    region_identifier, region_client, region_quickstart_entries, ami_cache=None, timings=None
+):
+    """
+    Return the Ubuntu listings in a region's ``getQuickstartList`` payload
+    enriched with the details of their AMIs.
+
+    All the AMIs in the payload are described up front in batches rather than
+    with one ``describe_images`` call per listing. AMIs found in ``ami_cache``
+    are not described at all.
+    """
+    ubuntu_quickstart_amis = []
+    quickstart_slot = 0
+    for ami in region_quickstart_entries["amiList"]:
+        quickstart_slot = quickstart_slot + 1
+        if ami["platform"] == "ubuntu":
+            ubuntu_quickstart_amis.append((quickstart_slot, ami))
+
+    ami_ids = [
+        ami.get(image_id_key)
+        for quickstart_slot, ami in ubuntu_quickstart_amis
+        for image_id_key, listing_arch in QUICKSTART_IMAGE_ID_KEYS
+        if ami.get(image_id_key, None)
+    ]
+    print(
+        "{} - Querying ami details for {} AMIs".format(
+            region_identifier, len(set(ami_ids))
+        )
+    )
+    with timed(timings, "describe_images", region=region_identifier):
+        ami_details = resolve_ami_details(region_identifier, region_client, ami_ids, ami_cache)
+
+    ubuntu_quick_start_listings = []
+    for quickstart_slot, ami in ubuntu_quickstart_amis:
+        for image_id_key, listing_arch in QUICKSTART_IMAGE_ID_KEYS:
+            ami_id = ami.get(image_id_key, None)
+            if not ami_id or ami_id not in ami_details:
+                continue
+            canonical_ami = get_ami_details(
+                ami.copy(), quickstart_slot, ami_id, ami_details[ami_id]
+            )
+            if canonical_ami:
+                canonical_ami["listing_arch"] = listing_arch
+                ubuntu_quick_start_listings.append(canonical_ami)
+    return ubuntu_quick_start_listings
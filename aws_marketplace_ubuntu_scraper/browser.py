@@ -0,0 +1,324 @@
+"""
+Signed in Firefox sessions on the AWS console and capture of the
+``getQuickstartList`` request through seleniumwire.
+"""
+import contextlib
+import json
+import re
+import threading
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.firefox.options import Options
+from selenium.common.exceptions import TimeoutException as SeleniumTimeoutException
+from selenium.common.exceptions import WebDriverException
+from seleniumwire import webdriver
+
+from aws_marketplace_ubuntu_scraper.timing import timed
+
+CONSOLE_SIGNIN_URL = "https://{}.signin.aws.amazon.com/console"
+CONSOLE_HOME_URL = "https://console.aws.amazon.com/console/home?region={}"
+# Firefox preferences which stop the console loading what the scrape does
+# not need. Stylesheets are left alone as the waits for clickable elements
+# depend on the console's layout.
+BROWSER_BLOCKING_PREFERENCES = {
+    # Images
+    "permissions.default.image": 2,
+    # Web fonts
+    "browser.display.use_document_fonts": 0,
+    "gfx.downloadable_fonts.enabled": False,
+    # Analytics and other trackers on the Disconnect list
+    "privacy.trackingprotection.enabled": True,
+}
+# Browser sessions used when the available memory can not be read
+BROWSER_SESSIONS = 4
+BROWSER_SESSIONS_MAX = 16
+# Memory set aside for each Firefox, geckodriver and seleniumwire proxy
+BROWSER_MEMORY_MB = 600
+QUICKSTART_LIST_CALL = "call=getQuickstartList"
+# Requests the browser's proxy records, everything else passes straight through
+QUICKSTART_CAPTURE_SCOPES = [".*{}.*".format(re.escape(QUICKSTART_LIST_CALL))]
+# Seconds to wait for the getQuickstartList response and between checks for it
+QUICKSTART_CAPTURE_TIMEOUT = 30
+QUICKSTART_CAPTURE_POLL_INTERVAL = 0.25
+
+
+def wait_for_response(driver, path, timeout, poll_interval):
+    """
+    Block until the browser has received the response to a request whose path
+    contains ``path`` and return the captured request.
+
+    Raises SeleniumTimeoutException if no response arrives within ``timeout``
+    seconds.
+    """
+    def captured_request(driver):
+        for request in driver.requests:
+            if path in request.path and request.response:
+                return request
+        return False
+
+    return WebDriverWait(driver, timeout, poll_frequency=poll_interval).until(
+        captured_request,
+        "Timed out after {}s waiting for a response to {}".format(timeout, path),
+    )
+
+
+def sign_in(driver, account_id, username, password, region=None):
+    """
+    Sign ``driver`` in to the AWS console as the IAM user ``username``.
+    """
+    wait = WebDriverWait(driver, 20)
+    signin_url = CONSOLE_SIGNIN_URL.format(account_id)
+    if region:
+        signin_url = "{}?region={}".format(signin_url, region)
+    driver.get(signin_url)
+    wait.until(lambda driver: driver.find_element_by_id("username"))
+    username_element = driver.find_element_by_id("username")
+    username_element.send_keys(username)
+    password_element = driver.find_element_by_id("password")
+    password_element.send_keys(password)
+    driver.find_element_by_id("signin_button").click()
+    wait.until(lambda driver: driver.find_element_by_name("awsc-mezz-data"))
+
+
+def available_memory(meminfo_path="/proc/meminfo"):
+    """
+    Return the bytes of memory available for new processes without swapping,
+    or None if it can not be read.
+    """
+    try:
+        with open(meminfo_path) as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def browser_session_count(
+    browser_memory_mb=BROWSER_MEMORY_MB, max_sessions=BROWSER_SESSIONS_MAX, memory=None, processes=1
+):
+    """
+    Return how many browser sessions fit in the available memory with
+    ``browser_memory_mb`` set aside for each, between 1 and ``max_sessions``.
+
+    The memory is split evenly between ``processes`` scraper processes
+    sharing the host, such as several workers.
+    """
+    memory = available_memory() if memory is None else memory
+    if memory is None:
+        return max(1, min(BROWSER_SESSIONS, max_sessions) // processes)
+    return max(1, min(max_sessions, memory // processes // (browser_memory_mb * 1024 * 1024)))
+
+
+class BrowserSessionPool:
+    """
+    A fixed number of long lived Firefox sessions signed in to the AWS console.
+
+    Sessions are started and signed in the first time they are needed and are
+    then handed from region to region, which only has to change the console
+    URL rather than start a browser and sign in again.
+    """
+
+    def __init__(self, size, account_id, username, password, headless, timings=None, block_assets=True):
+        self.size = size
+        self.timings = timings
+        self.account_id = account_id
+        self.username = username
+        self.password = password
+        self.driver_options = Options()
+        self.driver_options.headless = headless
+        if block_assets:
+            for name, value in BROWSER_BLOCKING_PREFERENCES.items():
+                self.driver_options.set_preference(name, value)
+        self._condition = threading.Condition()
+        self._idle_drivers = []
+        self._drivers = []
+        self._starting = 0
+
+    def _start_driver(self):
+        with timed(self.timings, "browser_start"):
+            driver = webdriver.Firefox(options=self.driver_options)
+        driver.scopes = QUICKSTART_CAPTURE_SCOPES
+        try:
+            with timed(self.timings, "sign_in"):
+                sign_in(driver, self.account_id, self.username, self.password)
+        except Exception:
+            driver.quit()
+            raise
+        return driver
+
+    def _quit_driver(self, driver):
+        try:
+            driver.delete_all_cookies()
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def _acquire(self):
+        with self._condition:
+            while not self._idle_drivers and len(self._drivers) + self._starting >= self.size:
+                self._condition.wait()
+            if self._idle_drivers:
+                return self._idle_drivers.pop()
+            self._starting = self._starting + 1
+        # Start the browser outside of the lock as it takes a while
+        driver = None
+        try:
+            driver = self._start_driver()
+        finally:
+            with self._condition:
+                self._starting = self._starting - 1
+                if driver:
+                    self._drivers.append(driver)
+                else:
+                    self._condition.notify()
+        return driver
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Check out a signed in driver for the duration of the ``with`` block.
+
+        Drivers are discarded, and replaced when next needed, if the browser
+        fails with anything other than a timeout.
+        """
+        driver = self._acquire()
+        try:
+            yield driver
+        except WebDriverException as wde:
+            if not isinstance(wde, SeleniumTimeoutException):
+                with self._condition:
+                    self._drivers.remove(driver)
+                    self._condition.notify()
+                self._quit_driver(driver)
+                driver = None
+            raise
+        finally:
+            if driver:
+                with self._condition:
+                    self._idle_drivers.append(driver)
+                    self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            drivers = self._drivers
+            self._drivers = []
+            self._idle_drivers = []
+        for driver in drivers:
+            self._quit_driver(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_region_console(driver, browser_pool, region):
+    """
+    Point a signed in ``driver`` at the console home page of ``region``,
+    signing in again if the console session has expired.
+    """
+    driver.switch_to.default_content()
+    driver.get(CONSOLE_HOME_URL.format(region))
+    if "signin" in driver.current_url:
+        with timed(browser_pool.timings, "sign_in", region=region):
+            sign_in(
+                driver,
+                browser_pool.account_id,
+                browser_pool.username,
+                browser_pool.password,
+                region,
+            )
+
+
+def get_regions(browser_pool, only_regions):
+    # region_dict = {"name": "US East", "location": "N. Virginia", "id": "us-east-1" }
+    # return [region_dict]
+    # region_dict = {"name": "Asia Pacific", "location": "Seoul", "id": "ap-northeast-2"}
+    # return [region_dict]
+    # region_dict = {"name": "Europe", "location": "Ireland",
+    #                "id": "eu-west-1"}
+    # return [region_dict]
+    with browser_pool.session() as driver, timed(browser_pool.timings, "get_regions"):
+        wait = WebDriverWait(driver, 10)
+        wait.until(lambda driver: driver.find_element_by_name("awsc-mezz-data"))
+        region_list_element = driver.find_element_by_name("awsc-mezz-data")
+        region_list_str = region_list_element.get_attribute("content")
+        region_list = json.loads(region_list_str)["regions"]
+
+    if only_regions:
+        return [reg for reg in region_list if reg['id'] in only_regions]
+    return region_list
+
+
+def capture_quickstart_list(driver, browser_pool, region_identifier, capture_timeout, capture_poll_interval):
+    """
+    Open the quickstart AMIs of the launch wizard for one region with a signed
+    in ``driver`` from ``browser_pool``.
+
+    Returns a tuple of how long the quickstart list took to arrive and the
+    captured ``getQuickstartList`` request, with its request and response
+    bodies already read so it can be used once the driver has moved on.
+    """
+    wait = WebDriverWait(driver, 20)
+    timings = browser_pool.timings
+    # Forget the requests captured in the previous region this driver
+    # scraped so they are not mistaken for this region's.
+    del driver.requests
+    with timed(timings, "open_console", region=region_identifier):
+        open_region_console(driver, browser_pool, region_identifier)
+
+    with timed(timings, "launch_wizard", region=region_identifier):
+        wait.until(EC.element_to_be_clickable((By.ID, 'EC2_LAUNCH_WIZARD')))
+        driver.find_element(By.ID, "EC2_LAUNCH_WIZARD").click()
+
+    with timed(timings, "iframe_switch", region=region_identifier):
+        wait.until(
+            lambda driver: driver.find_element_by_xpath(
+                '//iframe[@id="instance-lx-gwt-frame"]'
+            )
+        )
+        dashboard_iframe = driver.find_element_by_xpath(
+            '//iframe[@id="instance-lx-gwt-frame"]'
+        )
+        driver.switch_to.frame(dashboard_iframe)
+
+    with timed(timings, "quickstart_tab", region=region_identifier):
+        wait.until(
+            lambda driver: driver.find_element_by_id(
+                "gwt-debug-tab-QUICKSTART_AMIS"
+            )
+        )
+        driver.find_element_by_id("gwt-debug-tab-QUICKSTART_AMIS").click()
+        wait.until(
+            lambda driver: driver.find_element_by_id(
+                "gwt-debug-tab-QUICKSTART_AMIS"
+            )
+        )
+        wait.until(
+            lambda driver: driver.find_element_by_id("gwt-debug-paginatorLabel")
+        )
+    print("{} - Querying quickstart list".format(region_identifier))
+    capture_start = time.time()
+    request = wait_for_response(
+        driver, QUICKSTART_LIST_CALL, capture_timeout, capture_poll_interval
+    )
+    capture_time = time.time() - capture_start
+    # Read the bodies, which the request object keeps, before clearing the
+    # proxy's copies so they do not use memory until the next region.
+    request.body
+    request.response.body
+    del driver.requests
+    if timings:
+        timings.record("quickstart_capture", capture_time, region=region_identifier)
+    print(
+        "{} - Captured quickstart list in {:.2f}s".format(
+            region_identifier, capture_time
+        )
+    )
+    return (capture_time, request)
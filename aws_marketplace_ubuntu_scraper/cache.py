@@ -0,0 +1,206 @@
+"""
+On-disk SQLite caches of AMI details and marketplace pages.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "aws-marketplace-ubuntu-scraper",
+)
+AMI_CACHE_PATH = os.path.join(CACHE_DIR, "ami-cache.sqlite")
+# Published AMIs never change but stop cached AMIs that are no longer
+# listed anywhere from accumulating forever
+AMI_CACHE_MAX_AGE = 90 * 24 * 60 * 60
+AMI_CACHE_MAX_ENTRIES = 100000
+HTTP_CACHE_PATH = os.path.join(CACHE_DIR, "http-cache.sqlite")
+# By default cached pages are always revalidated with a conditional request
+HTTP_CACHE_TTL = 0
+HTTP_CACHE_MAX_SIZE = 200 * 1024 * 1024
+
+
+class AmiCache:
+    """
+    On-disk cache of ``describe_images`` records and their parsed name
+    attributes keyed by region and AMI ID.
+
+    Entries older than ``max_age`` seconds are evicted, as are the least
+    recently used entries when there are more than ``max_entries``.
+    """
+
+    def __init__(self, path=AMI_CACHE_PATH, max_age=AMI_CACHE_MAX_AGE, max_entries=AMI_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_age = max_age
+        self.max_entries = max_entries
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        # Regions are scraped in parallel so allow time for other writers
+        self._connection = sqlite3.connect(path, timeout=30)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS amis ("
+                "region TEXT NOT NULL, "
+                "ami_id TEXT NOT NULL, "
+                "image TEXT NOT NULL, "
+                "image_details TEXT, "
+                "stored_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (region, ami_id))"
+            )
+
+    def get_many(self, region, ami_ids):
+        """
+        Return a dict of AMI ID to a tuple of the image record and its parsed
+        name attributes for each of ``ami_ids`` that is in the cache.
+        """
+        ami_ids = list(dict.fromkeys(ami_ids))
+        if not ami_ids:
+            return {}
+        oldest = time.time() - self.max_age
+        rows = self._connection.execute(
+            "SELECT ami_id, image, image_details FROM amis "
+            "WHERE region = ? AND stored_at >= ? AND ami_id IN ({})".format(
+                ", ".join("?" * len(ami_ids))
+            ),
+            [region, oldest] + ami_ids,
+        ).fetchall()
+        records = {}
+        for ami_id, image, image_details in rows:
+            image_details = json.loads(image_details)
+            if image_details:
+                image_details = tuple(image_details)
+            records[ami_id] = (json.loads(image), image_details)
+        if records:
+            with self._connection:
+                self._connection.executemany(
+                    "UPDATE amis SET accessed_at = ? WHERE region = ? AND ami_id = ?",
+                    [(time.time(), region, ami_id) for ami_id in records],
+                )
+        return records
+
+    def put_many(self, region, records):
+        """
+        Store ``records``, a dict of AMI ID to a tuple of the image record and
+        its parsed name attributes.
+        """
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO amis VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (region, ami_id, json.dumps(image), json.dumps(image_details), now, now)
+                    for ami_id, (image, image_details) in records.items()
+                ],
+            )
+
+    def evict(self):
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM amis WHERE stored_at < ?", (time.time() - self.max_age,)
+            )
+            self._connection.execute(
+                "DELETE FROM amis WHERE rowid IN ("
+                "SELECT rowid FROM amis ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def close(self):
+        self._connection.close()
+
+
+class HttpCache:
+    """
+    On-disk cache of response bodies along with their ETag and Last-Modified
+    headers, keyed by URL.
+
+    Cached responses younger than ``ttl`` seconds are used as they are. Older
+    ones are revalidated with a conditional request. The least recently used
+    responses are evicted once the cached bodies total more than ``max_size``
+    bytes.
+    """
+
+    def __init__(self, path=HTTP_CACHE_PATH, ttl=HTTP_CACHE_TTL, max_size=HTTP_CACHE_MAX_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        cache_dir = os.path.dirname(path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        # The connection is shared by all the fetch threads
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "url TEXT PRIMARY KEY, "
+                "body BLOB NOT NULL, "
+                "etag TEXT, "
+                "last_modified TEXT, "
+                "validated_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+
+    def get(self, url):
+        """
+        Return a tuple of the cached body, ETag, Last-Modified and whether the
+        response is still fresh, or None if ``url`` is not cached.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, validated_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if not row:
+            return None
+        body, etag, last_modified, validated_at = row
+        return (body, etag, last_modified, time.time() - validated_at < self.ttl)
+
+    def put(self, url, body, etag, last_modified):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, now, now),
+            )
+
+    def touch(self, url, validated=False):
+        now = time.time()
+        with self._lock, self._connection:
+            if validated:
+                self._connection.execute(
+                    "UPDATE responses SET validated_at = ?, accessed_at = ? WHERE url = ?",
+                    (now, now, url),
+                )
+            else:
+                self._connection.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE url = ?", (now, url)
+                )
+
+    def record(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def evict(self):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM responses WHERE url IN ("
+                "SELECT url FROM (SELECT url, SUM(LENGTH(body)) OVER "
+                "(ORDER BY accessed_at DESC, url) AS cumulative_size FROM responses) "
+                "WHERE cumulative_size > ?)",
+                (self.max_size,),
+            )
+
+    def summary(self):
+        return "HTTP cache: {} hits, {} revalidated, {} misses".format(
+            self.hits, self.revalidated, self.misses
+        )
+
+    def close(self):
+        self._connection.close()
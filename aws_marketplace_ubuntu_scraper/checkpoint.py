@@ -0,0 +1,78 @@
+"""
+Checkpoint of each region's quicklaunch result so interrupted runs can resume.
+"""
+import json
+import os
+
+QUICKSTART_CHECKPOINT_PATH = "quickstart_checkpoint.ndjson"
+
+
+class QuickstartCheckpoint:
+    """
+    Append-only NDJSON file of the result of each region as it completes.
+
+    A region's latest record wins, so a region that failed can be retried by
+    resuming and its new result appended.
+    """
+
+    def __init__(self, path=QUICKSTART_CHECKPOINT_PATH):
+        self.path = path
+        # Start a new line if a killed run left a record cut short so that the
+        # next record is not appended to it.
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb+") as checkpoint_file:
+                checkpoint_file.seek(-1, os.SEEK_END)
+                if checkpoint_file.read(1) != b"\n":
+                    checkpoint_file.write(b"\n")
+
+    def reset(self):
+        open(self.path, "w").close()
+
+    def append(self, region, listings, capture_time, error):
+        record = {
+            "region": region,
+            "listings": listings,
+            "capture_time": capture_time,
+            "error": error,
+        }
+        with open(self.path, "a") as checkpoint_file:
+            checkpoint_file.write(json.dumps(record) + "\n")
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+
+    def records(self):
+        """
+        Return a dict of region to its latest record.
+        """
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path) as checkpoint_file:
+            for line in checkpoint_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A run killed part way through writing a record
+                    continue
+                if not isinstance(record, dict) or "region" not in record or "error" not in record:
+                    # Not a checkpoint record, such as --ndjson-out output
+                    continue
+                records[record["region"]] = record
+        return records
+
+    def completed_regions(self):
+        return {
+            region for region, record in self.records().items() if record["error"] is None
+        }
+
+    def results(self, regions):
+        """
+        Return the (region, listings, capture time, error) tuples of
+        ``regions`` that have a record.
+        """
+        records = self.records()
+        return [
+            (region, records[region]["listings"], records[region]["capture_time"], records[region]["error"])
+            for region in regions
+            if region in records
+        ]
@@ -0,0 +1,98 @@
+"""
+Command line entry point. Each command's module, and the dependencies it
+needs, is only imported when that command is run.
+"""
+import importlib
+
+import click
+
+# Command name to the module and function implementing it and the summary
+# shown by --help, which lists the commands without importing them.
+COMMANDS = {
+    "quicklaunch": (
+        "aws_marketplace_ubuntu_scraper.quicklaunch",
+        "quicklaunch",
+        "Scrape the Ubuntu quickstart listings of every region.",
+    ),
+    "quicklaunch-report": (
+        "aws_marketplace_ubuntu_scraper.report",
+        "quicklaunch_report",
+        "Compare quickstart listings with the latest published AMIs.",
+    ),
+    "quicklaunch-validate": (
+        "aws_marketplace_ubuntu_scraper.validation",
+        "quicklaunch_validate",
+        "Check saved quickstart listings for issues.",
+    ),
+    "quicklaunch-watch": (
+        "aws_marketplace_ubuntu_scraper.watch",
+        "quicklaunch_watch",
+        "Poll the quickstart listings and print what changed.",
+    ),
+    "quicklaunch-coordinator": (
+        "aws_marketplace_ubuntu_scraper.sharding",
+        "quicklaunch_coordinator",
+        "Queue the regions in shards for quicklaunch workers.",
+    ),
+    "quicklaunch-worker": (
+        "aws_marketplace_ubuntu_scraper.sharding",
+        "quicklaunch_worker",
+        "Scrape the region shards queued by a coordinator.",
+    ),
+    "history-slots": (
+        "aws_marketplace_ubuntu_scraper.history",
+        "history_slots",
+        "Print the recorded quickstart slots of a release in a region.",
+    ),
+    "history-serial-lag": (
+        "aws_marketplace_ubuntu_scraper.history",
+        "history_serial_lag",
+        "Print how far recorded listings lag behind the newest serial.",
+    ),
+    "marketplace": (
+        "aws_marketplace_ubuntu_scraper.marketplace",
+        "marketplace",
+        "Scrape Canonical's AWS marketplace listings.",
+    ),
+}
+
+
+class LazyGroup(click.Group):
+    """
+    A click group importing its ``lazy_commands`` the first time they are
+    looked up.
+    """
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_commands))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.commands and cmd_name in self.lazy_commands:
+            module_name, function_name, short_help = self.lazy_commands[cmd_name]
+            module = importlib.import_module(module_name)
+            self.add_command(getattr(module, function_name), cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx, formatter):
+        command_names = self.list_commands(ctx)
+        if not command_names:
+            return
+        limit = formatter.width - 6 - max(len(cmd_name) for cmd_name in command_names)
+        rows = []
+        for cmd_name in command_names:
+            if cmd_name in self.commands:
+                short_help = self.commands[cmd_name].get_short_help_str(limit)
+            else:
+                short_help = self.lazy_commands[cmd_name][2]
+            rows.append((cmd_name, short_help))
+        with formatter.section("Commands"):
+            formatter.write_dl(rows)
+
+
+@click.group(cls=LazyGroup, lazy_commands=COMMANDS)
+def main():
+    pass
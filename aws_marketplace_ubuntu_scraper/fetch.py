@@ -0,0 +1,120 @@
+"""
+Concurrent, cached HTTP fetching of marketplace pages.
+"""
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from aws_marketplace_ubuntu_scraper.timing import timed
+
+# Concurrency and retry policy of the marketplace page fetches
+HTTP_WORKERS = 16
+HTTP_WORKERS_PER_HOST = 8
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+
+
+class FetchEngine:
+    """
+    Fetch URLs concurrently over a shared keep-alive ``requests`` session.
+
+    At most ``max_workers`` requests are in flight at once, and at most
+    ``max_per_host`` of those to any one host. Connection errors and
+    throttled or failed responses are retried with exponential backoff.
+    Responses are cached in and revalidated against ``cache`` if given, and
+    the time spent on requests is recorded in ``timings`` if given, under the
+    phase each fetch is made for.
+    """
+
+    def __init__(
+        self,
+        max_workers=HTTP_WORKERS,
+        max_per_host=HTTP_WORKERS_PER_HOST,
+        retries=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        timeout=30,
+        cache=None,
+        timings=None,
+    ):
+        self.max_per_host = max_per_host
+        self.cache = cache
+        self.timings = timings
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_workers,
+            pool_maxsize=max_workers,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=(429, 500, 502, 503, 504),
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._host_semaphores = {}
+        self._lock = threading.Lock()
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_semaphores[host]
+
+    def fetch(self, url, phase="http_request"):
+        """
+        Return the content of ``url``, timing the request as ``phase``.
+        """
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            body, etag, last_modified, fresh = cached
+            if fresh:
+                self.cache.touch(url)
+                self.cache.record("hits")
+                return body
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        with self._host_semaphore(url), timed(self.timings, phase):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if self.cache:
+            if cached and response.status_code == 304:
+                self.cache.touch(url, validated=True)
+                self.cache.record("revalidated")
+                return cached[0]
+            self.cache.record("misses")
+            if response.status_code == 200:
+                self.cache.put(
+                    url,
+                    response.content,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                )
+        return response.content
+
+    def submit(self, url, phase="http_request"):
+        """
+        Queue ``url`` to be fetched and return a future for its content.
+        """
+        return self._executor.submit(self.fetch, url, phase)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
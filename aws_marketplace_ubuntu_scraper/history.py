@@ -0,0 +1,312 @@
+"""
+SQLite history of every run's quickstart listings and marketplace products
+and the commands querying it.
+"""
+import datetime
+import os
+import sqlite3
+import time
+
+import click
+
+HISTORY_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    "run_id INTEGER PRIMARY KEY, "
+    "command TEXT NOT NULL, "
+    "recorded_at REAL NOT NULL)",
+    # The regions each quicklaunch run scraped, so a listing missing from a
+    # region that was scraped can be told apart from a region that failed
+    "CREATE TABLE IF NOT EXISTS quickstart_regions ("
+    "run_id INTEGER NOT NULL REFERENCES runs, "
+    "region TEXT NOT NULL, "
+    "error TEXT, "
+    "PRIMARY KEY (region, run_id))",
+    "CREATE TABLE IF NOT EXISTS quickstart_entries ("
+    "run_id INTEGER NOT NULL REFERENCES runs, "
+    "region TEXT NOT NULL, "
+    "quickstart_slot INTEGER, "
+    "ami_id TEXT, "
+    "owner TEXT, "
+    "release_version TEXT, "
+    "listing_arch TEXT, "
+    "serial TEXT, "
+    "title TEXT)",
+    "CREATE INDEX IF NOT EXISTS quickstart_entries_listing "
+    "ON quickstart_entries (region, release_version, listing_arch, run_id)",
+    "CREATE INDEX IF NOT EXISTS quickstart_entries_run ON quickstart_entries (run_id)",
+    "CREATE TABLE IF NOT EXISTS marketplace_products ("
+    "run_id INTEGER NOT NULL REFERENCES runs, "
+    "product_order INTEGER, "
+    "page_order INTEGER, "
+    "release_version TEXT, "
+    "serial TEXT, "
+    "type TEXT, "
+    "title TEXT)",
+    "CREATE INDEX IF NOT EXISTS marketplace_products_run ON marketplace_products (run_id, release_version)",
+    "CREATE INDEX IF NOT EXISTS runs_command ON runs (command, recorded_at)",
+)
+
+
+def _serial_key(serial):
+    """
+    Sort key of an image serial such as 20201026 or 20201026.1.
+    """
+    try:
+        date, _, build = (serial or "").partition(".")
+        return (int(date), int(build or 0))
+    except ValueError:
+        return (0, 0)
+
+
+def serial_age(serial, newest_serial):
+    """
+    Return the number of days between the dates of two serials, or None if
+    either is not a dated serial.
+    """
+    try:
+        return (
+            datetime.datetime.strptime(newest_serial[:8], "%Y%m%d")
+            - datetime.datetime.strptime(serial[:8], "%Y%m%d")
+        ).days
+    except (TypeError, ValueError):
+        return None
+
+
+def format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+class HistoryStore:
+    """
+    SQLite database every quicklaunch and marketplace run's results are
+    appended to, indexed for queries over many runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        history_dir = os.path.dirname(path)
+        if history_dir:
+            os.makedirs(history_dir, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30)
+        with self._connection:
+            for statement in HISTORY_SCHEMA:
+                self._connection.execute(statement)
+
+    def _add_run(self, command, recorded_at):
+        return self._connection.execute(
+            "INSERT INTO runs (command, recorded_at) VALUES (?, ?)",
+            (command, recorded_at if recorded_at is not None else time.time()),
+        ).lastrowid
+
+    def record_quicklaunch(self, quickstart_results, recorded_at=None):
+        """
+        Append a quicklaunch run's (region, listings, capture time, error)
+        tuples. Returns the ID of the run.
+        """
+        with self._connection:
+            run_id = self._add_run("quicklaunch", recorded_at)
+            self._connection.executemany(
+                "INSERT INTO quickstart_regions VALUES (?, ?, ?)",
+                [(run_id, region, error) for region, listings, capture_time, error in quickstart_results],
+            )
+            self._connection.executemany(
+                "INSERT INTO quickstart_entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        region,
+                        listing.get("quickstart_slot"),
+                        listing.get("ami_id"),
+                        listing.get("owner"),
+                        listing.get("release_version"),
+                        listing.get("listing_arch"),
+                        listing.get("serial"),
+                        listing.get("title"),
+                    )
+                    for region, listings, capture_time, error in quickstart_results
+                    for listing in listings
+                ],
+            )
+        return run_id
+
+    def record_marketplace(self, products_by_page, recorded_at=None):
+        """
+        Append a marketplace run's (page, products) tuples. Returns the ID of
+        the run.
+        """
+        with self._connection:
+            run_id = self._add_run("marketplace", recorded_at)
+            self._connection.executemany(
+                "INSERT INTO marketplace_products VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        run_id,
+                        product["product_order"],
+                        int(product["page_order"]) if product["page_order"] else None,
+                        product["release_version"],
+                        product["serial"],
+                        product["type"],
+                        product["title"],
+                    )
+                    for page, products in products_by_page
+                    for product in products
+                ],
+            )
+        return run_id
+
+    def latest_run(self, command):
+        row = self._connection.execute(
+            "SELECT run_id FROM runs WHERE command = ? ORDER BY recorded_at DESC, run_id DESC LIMIT 1",
+            (command,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def slot_history(self, region, release_version, listing_arch, owner="Canonical", since=None):
+        """
+        Return a (recorded at, slot, AMI ID, serial) tuple for each listing of
+        ``release_version`` and ``listing_arch`` in every quicklaunch run
+        which scraped ``region``. Runs without such a listing have a tuple
+        with None in place of the slot, AMI ID and serial.
+        """
+        return self._connection.execute(
+            "SELECT runs.recorded_at, entries.quickstart_slot, entries.ami_id, entries.serial "
+            "FROM quickstart_regions AS regions "
+            "JOIN runs ON runs.run_id = regions.run_id "
+            "LEFT JOIN quickstart_entries AS entries ON entries.run_id = regions.run_id "
+            "AND entries.region = regions.region "
+            "AND entries.release_version = ? AND entries.listing_arch = ? AND entries.owner = ? "
+            "WHERE regions.region = ? AND regions.error IS NULL AND runs.recorded_at >= ? "
+            "ORDER BY runs.recorded_at, runs.run_id, entries.quickstart_slot",
+            (release_version, listing_arch, owner, region, since or 0),
+        ).fetchall()
+
+    def serial_lag(self, run_id=None, owner="Canonical"):
+        """
+        Return how far each ``owner`` listing of a quicklaunch run, by default
+        the latest, lags behind the newest serial of its release and
+        architecture listed in any region of that run and in the latest
+        marketplace run.
+
+        Returns a list of dicts sorted by region and slot.
+        """
+        if run_id is None:
+            run_id = self.latest_run("quicklaunch")
+        rows = self._connection.execute(
+            "SELECT region, quickstart_slot, release_version, listing_arch, ami_id, serial "
+            "FROM quickstart_entries WHERE run_id = ? AND owner = ? ORDER BY region, quickstart_slot",
+            (run_id, owner),
+        ).fetchall()
+
+        newest_serials = {}
+        for region, quickstart_slot, release_version, listing_arch, ami_id, serial in rows:
+            newest_serial = newest_serials.get((release_version, listing_arch))
+            if newest_serial is None or _serial_key(serial) > _serial_key(newest_serial):
+                newest_serials[(release_version, listing_arch)] = serial
+        marketplace_serials = {}
+        marketplace_run_id = self.latest_run("marketplace")
+        if marketplace_run_id is not None:
+            for release_version, serial in self._connection.execute(
+                "SELECT release_version, serial FROM marketplace_products WHERE run_id = ?",
+                (marketplace_run_id,),
+            ):
+                newest_serial = marketplace_serials.get(release_version)
+                if newest_serial is None or _serial_key(serial) > _serial_key(newest_serial):
+                    marketplace_serials[release_version] = serial
+
+        serial_lags = []
+        for region, quickstart_slot, release_version, listing_arch, ami_id, serial in rows:
+            newest_serial = newest_serials[(release_version, listing_arch)]
+            marketplace_serial = marketplace_serials.get(release_version)
+            serial_lags.append(
+                {
+                    "region": region,
+                    "quickstart_slot": quickstart_slot,
+                    "release_version": release_version,
+                    "listing_arch": listing_arch,
+                    "ami_id": ami_id,
+                    "serial": serial,
+                    "newest_serial": newest_serial,
+                    "lag_days": serial_age(serial, newest_serial),
+                    "marketplace_serial": marketplace_serial,
+                    "marketplace_lag_days": serial_age(serial, marketplace_serial),
+                }
+            )
+        return serial_lags
+
+    def close(self):
+        self._connection.close()
+
+
+def history_db_option(function):
+    return click.option(
+        "--history-db",
+        type=click.Path(dir_okay=False),
+        help="Append this run's results to a SQLite history database.",
+    )(function)
+
+
+@click.command(name="history-slots")
+@click.option("--history-db", type=click.Path(exists=True, dir_okay=False), required=True)
+@click.option("--region", required=True)
+@click.option("--release", "release_version", required=True, help="Release version such as 20.04.")
+@click.option("--arch", "listing_arch", default="amd64", show_default=True)
+@click.option("--owner", default="Canonical", show_default=True)
+@click.option("--days", type=click.IntRange(min=1), help="Only show runs from the last number of days.")
+@click.option(
+    "--changes-only/--no-changes-only",
+    default=False,
+    help="Only show the runs in which the slot changed.",
+)
+def history_slots(history_db, region, release_version, listing_arch, owner, days, changes_only):
+    """
+    Print the quickstart slot of a release in a region in each recorded run.
+    """
+    history = HistoryStore(history_db)
+    try:
+        since = time.time() - days * 24 * 60 * 60 if days else None
+        slot_history = history.slot_history(region, release_version, listing_arch, owner, since)
+    finally:
+        history.close()
+    previous_slot = ()
+    for recorded_at, quickstart_slot, ami_id, serial in slot_history:
+        if changes_only and quickstart_slot == previous_slot:
+            continue
+        previous_slot = quickstart_slot
+        if quickstart_slot is None:
+            print("{} not listed".format(format_time(recorded_at)))
+        else:
+            print("{} slot {:<3} {} {}".format(format_time(recorded_at), quickstart_slot, ami_id, serial))
+
+
+@click.command(name="history-serial-lag")
+@click.option("--history-db", type=click.Path(exists=True, dir_okay=False), required=True)
+@click.option("--owner", default="Canonical", show_default=True)
+@click.option(
+    "--min-lag",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="Only show listings at least this many days behind the newest serial.",
+)
+def history_serial_lag(history_db, owner, min_lag):
+    """
+    Print how many days each listing of the latest recorded quicklaunch run
+    is behind the newest serial of its release, in any region and on the
+    marketplace.
+    """
+    history = HistoryStore(history_db)
+    try:
+        serial_lags = history.serial_lag(owner=owner)
+    finally:
+        history.close()
+    for serial_lag in serial_lags:
+        lags = [serial_lag["lag_days"] or 0, serial_lag["marketplace_lag_days"] or 0]
+        if max(lags) < min_lag:
+            continue
+        print(
+            "{region:<16} slot {quickstart_slot:<3} {release_version} {listing_arch:<6} {ami_id} "
+            "{serial} newest {newest_serial} ({lag_days} days) marketplace {marketplace_serial} "
+            "({marketplace_lag_days} days)".format(
+                **{key: "-" if value is None else value for key, value in serial_lag.items()}
+            )
+        )
@@ -0,0 +1,399 @@
+"""
+The ``marketplace`` command, scraping Canonical's AWS marketplace listings.
+"""
+import json
+import os
+import re
+
+from concurrent.futures import as_completed
+
+import click
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from aws_marketplace_ubuntu_scraper.cache import HTTP_CACHE_PATH, HTTP_CACHE_TTL, HttpCache
+from aws_marketplace_ubuntu_scraper.fetch import HTTP_WORKERS, HTTP_WORKERS_PER_HOST, FetchEngine
+from aws_marketplace_ubuntu_scraper.history import HistoryStore, history_db_option
+from aws_marketplace_ubuntu_scraper.output import marketplace_records, ndjson_options, write_ndjson
+from aws_marketplace_ubuntu_scraper.timing import Timings, check_metrics_out, timed
+
+try:
+    import lxml  # noqa: F401
+    # lxml is optional but parses pages many times faster than html.parser
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+CANONICAL_MARKETPLACE_PROFILE = "565feec9-3d43-413e-9760-c651546613f2"
+MARKETPLACE_URL_BASE = "https://aws.amazon.com"
+MARKETPLACE_PROFILE_URL_BASE = "{}/marketplace/seller-profile".format(MARKETPLACE_URL_BASE)
+# Only the parts of the pages that are read are built into a tree
+MARKETPLACE_PAGINATION_STRAINER = SoupStrainer("div", class_="pagination-bar")
+MARKETPLACE_PRODUCTS_STRAINER = SoupStrainer("div", class_="vendor-products")
+MARKETPLACE_LISTING_STRAINER = SoupStrainer("div", class_="pdp-attributes")
+MARKETPLACE_VERSION_REGEX = re.compile(
+    r".*?(?P<release_version>\d\d\.\d\d?)"
+    r".*?(?P<serial>\d\d\d\d\d\d\d\d(\.\d{1,2})?).*?"
+)
+MARKETPLACE_PAGE_COUNT_REGEX = re.compile(r".*?page=(?P<page_count>\d?)")
+# The products of the last run, which --incremental reuses the types of
+MARKETPLACE_STATE_PATH = "marketplace_products.json"
+
+
+def get_marketplace_page_links(page_content):
+    page_soup = BeautifulSoup(
+        page_content, features=HTML_PARSER, parse_only=MARKETPLACE_PAGINATION_STRAINER
+    )
+    page_link_elements = page_soup.select("div.pagination-bar ul.pagination li a")
+    page_links = set()
+    for page_link_element in page_link_elements:
+        href = page_link_element.get("href", None)
+        if href:
+            page_links.add("{}{}".format(MARKETPLACE_PROFILE_URL_BASE, href))
+    return page_links
+
+
+def parse_marketplace_page(page_content, page_count):
+    """
+    Return the products listed on a seller profile page. The type of each
+    product is only available on its listing page so is not filled in.
+    """
+    page_soup = BeautifulSoup(
+        page_content, features=HTML_PARSER, parse_only=MARKETPLACE_PRODUCTS_STRAINER
+    )
+    product_elements = page_soup.select(
+        "div.vendor-products article.products div.col-xs-10"
+    )
+    products = []
+    product_order = (int(page_count) * 10) - 10
+    product_in_page_order = 0
+    for product_element in product_elements:
+        product_order = product_order + 1
+        product_in_page_order = product_in_page_order + 1
+
+        product_title_element = product_element.select_one("div.row h1")
+        product_title = (
+            product_title_element.get_text().strip()
+            if product_title_element
+            else ""
+        )
+
+        product_version_element = product_element.select_one(
+            "ul.info li:nth-child(1)"
+        )
+        product_version = (
+            product_version_element.get_text().strip()
+            if product_version_element
+            else ""
+        )
+
+        product_pricing_element = product_element.select_one("p.pricing span.price")
+        product_pricing = (
+            product_pricing_element.get_text().strip()
+            if product_pricing_element
+            else ""
+        )
+
+        product_info_element = product_element.select_one("p.delivery")
+        product_info = (
+            product_info_element.get_text().strip() if product_info_element else ""
+        )
+
+        product_description_element = product_element.select_one("p.description")
+        product_description = (
+            product_description_element.get_text().strip()
+            if product_description_element
+            else ""
+        )
+
+        marketplace_url_element = product_title_element.select_one("a")
+        marketplace_url = marketplace_url_element.get("href")
+
+        release_version = ""
+        serial = ""
+        match = MARKETPLACE_VERSION_REGEX.match(product_version)
+
+        if match:
+            attrs = match.groupdict()
+            release_version = attrs.get("release_version", None)
+            serial = attrs.get("serial", None)
+
+        products.append(
+            {
+                "version": product_version,
+                "release_version": release_version,
+                "title": product_title,
+                "pricing": product_pricing,
+                "info": product_info,
+                "description": product_description,
+                "product_in_page_order": product_in_page_order,
+                "page_order": page_count,
+                "product_order": product_order,
+                "serial": serial,
+                "marketplace_url": "{}{}".format(MARKETPLACE_URL_BASE, marketplace_url),
+            }
+        )
+    return products
+
+
+def parse_marketplace_listing(listing_page_content):
+    """
+    Return the fulfillment option (e.g. "Amazon Machine Image") of a product
+    listing page.
+    """
+    listing_page_soup = BeautifulSoup(
+        listing_page_content, features=HTML_PARSER, parse_only=MARKETPLACE_LISTING_STRAINER
+    )
+    fullfillment_options_element = listing_page_soup.select_one(
+        "div.pdp-attributes div.fulfillment-options ul li:nth-child(1)"
+    )
+    return (
+        fullfillment_options_element.get_text().strip()
+        if fullfillment_options_element
+        else ""
+    )
+
+
+def build_marketplace_product(product, fullfillment_options):
+    product_unique_identifier = "{} ({}) - {}".format(
+        product["title"], fullfillment_options, product["serial"]
+    )
+    return dict(
+        {"unique_identifier": product_unique_identifier},
+        **product,
+        type=fullfillment_options,
+    )
+
+
+def marketplace_product_key(product):
+    """
+    The fields of a product on the seller profile page which change whenever
+    its listing page may have.
+    """
+    return (product["title"], product["version"], product["marketplace_url"])
+
+
+def load_marketplace_state(path):
+    """
+    Return a dict of ``marketplace_product_key`` to the type of each product
+    in the results of a previous run saved at ``path``. Products whose
+    listing page failed to fetch have no type and are left out so they are
+    fetched again.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as state_file:
+        try:
+            products_by_page = json.load(state_file)
+        except ValueError:
+            return {}
+    return {
+        marketplace_product_key(product): product["type"]
+        for page, products in products_by_page
+        for product in products
+        if product["type"]
+    }
+
+
+def write_marketplace_state(path, products_by_page):
+    with open(path + ".tmp", "w") as state_file:
+        json.dump(products_by_page, state_file, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def scrape_marketplace(fetch_engine, marketplace_urls, timings=None, previous_types=None):
+    """
+    Scrape the products on every seller profile page in ``marketplace_urls``
+    along with their listing pages.
+
+    All the pages, and the listing pages of their products as soon as each
+    page has been parsed, are fetched through the one ``fetch_engine`` queue.
+    The listing pages of products found in ``previous_types``, as returned by
+    ``load_marketplace_state``, are not fetched and their previous type is
+    used instead.
+
+    Returns a list of (page count, products) tuples sorted by page.
+    """
+    previous_types = previous_types or {}
+    page_futures = {}
+    for marketplace_url in marketplace_urls:
+        page_count = ""
+        match = MARKETPLACE_PAGE_COUNT_REGEX.match(marketplace_url)
+
+        if match:
+            attrs = match.groupdict()
+            page_count = attrs.get("page_count", None)
+        page_futures[fetch_engine.submit(marketplace_url, "page_request")] = page_count
+
+    pages = []
+    for page_future in as_completed(page_futures):
+        page_count = page_futures[page_future]
+        page_content = page_future.result()
+        with timed(timings, "page_parse"):
+            products = parse_marketplace_page(page_content, page_count)
+        listing_futures = [
+            None
+            if marketplace_product_key(product) in previous_types
+            else fetch_engine.submit(product["marketplace_url"], "listing_request")
+            for product in products
+        ]
+        pages.append((page_count, products, listing_futures))
+
+    parallel_products = []
+    for page_count, products, listing_futures in pages:
+        page_products = []
+        for product, listing_future in zip(products, listing_futures):
+            if listing_future is None:
+                page_products.append(
+                    build_marketplace_product(product, previous_types[marketplace_product_key(product)])
+                )
+                continue
+            listing_content = listing_future.result()
+            with timed(timings, "listing_parse"):
+                page_products.append(
+                    build_marketplace_product(product, parse_marketplace_listing(listing_content))
+                )
+        parallel_products.append((page_count, page_products))
+    return sorted(parallel_products, key=lambda tup: tup[0])
+
+
+@click.command()
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=HTTP_WORKERS,
+    show_default=True,
+    help="Maximum number of pages fetched at once.",
+)
+@click.option(
+    "--workers-per-host",
+    type=click.IntRange(min=1),
+    default=HTTP_WORKERS_PER_HOST,
+    show_default=True,
+    help="Maximum number of pages fetched at once from a single host.",
+)
+@click.option(
+    "--http-cache/--no-http-cache",
+    default=True,
+    help="Cache pages on disk and only download them again when they have changed.",
+)
+@click.option(
+    "--http-cache-path",
+    type=click.Path(dir_okay=False),
+    default=HTTP_CACHE_PATH,
+    show_default=True,
+    help="Path of the page cache.",
+)
+@click.option(
+    "--http-cache-ttl",
+    type=click.IntRange(min=0),
+    default=HTTP_CACHE_TTL,
+    show_default=True,
+    help="Seconds a cached page is used without checking whether it has changed.",
+)
+@click.option(
+    "--metrics-out",
+    type=click.Path(dir_okay=False),
+    callback=check_metrics_out,
+    help="Write per-phase timings to this JSON file, and a Prometheus textfile "
+    "collector file next to it with a .prom extension.",
+)
+@click.option(
+    "--incremental/--no-incremental",
+    default=False,
+    help="Only fetch the listing pages of products which are new or changed "
+    "since the previous run saved in --state.",
+)
+@click.option(
+    "--state",
+    type=click.Path(dir_okay=False),
+    default=MARKETPLACE_STATE_PATH,
+    show_default=True,
+    help="JSON file each run's products are saved to.",
+)
+@history_db_option
+@ndjson_options
+def marketplace(
+    workers,
+    workers_per_host,
+    http_cache,
+    http_cache_path,
+    http_cache_ttl,
+    metrics_out,
+    incremental,
+    state,
+    history_db,
+    ndjson_out,
+    fields,
+):
+    public_profile_url = "{}?id={}".format(
+        MARKETPLACE_PROFILE_URL_BASE, CANONICAL_MARKETPLACE_PROFILE
+    )
+    timings = Timings("marketplace") if metrics_out else None
+    previous_types = load_marketplace_state(state) if incremental else {}
+    page_cache = HttpCache(http_cache_path, ttl=http_cache_ttl) if http_cache else None
+    try:
+        with FetchEngine(
+            max_workers=workers, max_per_host=workers_per_host, cache=page_cache, timings=timings
+        ) as fetch_engine:
+            with timed(timings, "profile_fetch"):
+                page_links = get_marketplace_page_links(
+                    fetch_engine.fetch(public_profile_url, "page_request")
+                )
+            with timed(timings, "pages_scrape"):
+                sorted_parallel_products = scrape_marketplace(
+                    fetch_engine, page_links, timings, previous_types
+                )
+    finally:
+        if page_cache:
+            page_cache.evict()
+            page_cache.close()
+    print("Public profile URL: {}".format(public_profile_url))
+    for page, products_per_page in sorted_parallel_products:
+        for product in products_per_page:
+            print(
+                "\n{}\n\t\t"
+                "Release: {}\n\t\t"
+                "Serial: {}\n\t\t"
+                "Version: {}\n\t\t"
+                "Type: {}\n\t\t"
+                "Page: {} \n\t\t"
+                "Slot: {} \n\t\t"
+                "Title: {}\n\t\t"
+                "Description: \n\t\t\t\t{}\n\t\t"
+                "URL: {}\n\t\t".format(
+                    product["unique_identifier"],
+                    product["release_version"],
+                    product["serial"],
+                    product["version"],
+                    product["type"],
+                    product["page_order"],
+                    product["product_order"],
+                    product["title"],
+                    product["description"].replace("\n", "\n\t\t\t\t"),
+                    product["marketplace_url"],
+                )
+            )
+    write_marketplace_state(state, sorted_parallel_products)
+    if ndjson_out:
+        record_count = write_ndjson(ndjson_out, marketplace_records(sorted_parallel_products), fields)
+        print("Wrote {} products to {}".format(record_count, ndjson_out))
+    if incremental:
+        reused = sum(
+            1
+            for page, products in sorted_parallel_products
+            for product in products
+            if marketplace_product_key(product) in previous_types
+        )
+        print("Reused the types of {} unchanged products from {}".format(reused, state))
+    if page_cache:
+        print(page_cache.summary())
+    if history_db:
+        history = HistoryStore(history_db)
+        try:
+            run_id = history.record_marketplace(sorted_parallel_products)
+        finally:
+            history.close()
+        print("Recorded run {} in {}".format(run_id, history_db))
+    if timings:
+        timings.write(metrics_out)
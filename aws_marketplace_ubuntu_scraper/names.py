@@ -0,0 +1,117 @@
+"""
+Classify AMIs by owner and parse the attributes encoded in their names.
+"""
+import functools
+import re
+
+CANONICAL_OWNER = "099720109477"
+AWS_UBUNTU_PRO_OWNER_ALIAS = "aws-marketplace"
+AWS_UBUNTU_DEEP_LEARNING_OWNER_ALIAS = "amazon"
+AMI_NAME_CACHE_SIZE = 16384
+
+
+class AmiNameParser:
+    """
+    Registry of the compiled AMI name patterns of each AMI owner.
+
+    ``parse`` is memoized as the same AMI names are parsed over and over
+    again across regions and runs.
+    """
+
+    def __init__(self, cache_size=AMI_NAME_CACHE_SIZE):
+        self._patterns = {}
+        self._labels = {}
+        self._parse = functools.lru_cache(maxsize=cache_size)(self._parse_uncached)
+
+    def register(self, owner, pattern, label=None):
+        """
+        Register a name pattern for AMIs owned by ``owner``, an owner ID or
+        alias. Patterns of an owner are tried in the order they were
+        registered. ``label`` is the owner name reported for its AMIs.
+        """
+        self._patterns.setdefault(owner, []).append(re.compile(pattern))
+        self._labels[owner] = label or self._labels.get(owner, owner)
+        self._parse.cache_clear()
+
+    def __contains__(self, owner):
+        return owner in self._patterns
+
+    def _parse_uncached(self, name, owner):
+        owners = [owner] if owner is not None else list(self._patterns)
+        for pattern_owner in owners:
+            for pattern in self._patterns.get(pattern_owner, []):
+                match = pattern.match(name)
+                if match:
+                    return (self._labels[pattern_owner], match.groupdict())
+        return None
+
+    def parse(self, name, owner=None):
+        """
+        Return a tuple of the owner label and the attributes parsed from an
+        AMI ``name``, or None if it matches none of the patterns.
+
+        Only the patterns of ``owner`` are tried if it is given.
+        """
+        parsed = self._parse(name, owner)
+        if parsed:
+            label, attrs = parsed
+            # Copy so callers can not change the memoized attributes
+            return (label, dict(attrs))
+        return None
+
+    def parse_many(self, names, owner=None):
+        """
+        Parse each of ``names``, returning a list of results in the same order.
+        """
+        return [self.parse(name, owner) for name in names]
+
+    def label(self, owner):
+        return self._labels[owner]
+
+
+AMI_NAMES = AmiNameParser()
+# This is a Canonical AMI
+AMI_NAMES.register(
+    CANONICAL_OWNER,
+    r"ubuntu/images(-(?P<imgtype_path>[\w-]+))?/"
+    r"((?P<virt_storage>\w+(-\w+)?)/)?"
+    r"ubuntu-(?P<suite>\w+)-"
+    r"((?P<release_version>\d\d\.\d\d)-)?"
+    r"((?P<upload_type>\w+)-)?"
+    r"(?P<arch>\w+)-server-"
+    r"(?P<serial>\d+(\.\d{1,2})?)"
+    r"(\-(?P<custom>\w+))?",
+    label="Canonical",
+)
+# This is an AWS Ubuntu AMI - used for Ubuntu Pro listings
+# trusty-ua-tools-20191128-d984c693-feaa-4be0-bc34-2099410bc9cc-ami-075ab031d5a3404c6.4
+AMI_NAMES.register(
+    AWS_UBUNTU_PRO_OWNER_ALIAS,
+    r".*?"
+    r"(?P<serial>\d+(\.\d{1,2})?)"
+    r"-.*?-"
+    r"(?P<source_ami>ami-\w+).*?",
+)
+# This is an AWS Ubuntu AMI - used for
+# Ubuntu Deep learning and SQL server listings
+# ubuntu-xenial-16.04-amd64-server-20190212-SQL_2017_Standard-2019.04.02
+AMI_NAMES.register(
+    AWS_UBUNTU_DEEP_LEARNING_OWNER_ALIAS,
+    r"ubuntu-(?P<suite>\w+)-"
+    r"((?P<release_version>\d\d\.\d\d)-)?"
+    r"(?P<arch>\w+)-server-"
+    r"(?P<serial>\d+(\.\d{1,2})?)"
+    r"-.*?",
+)
+
+
+def parse_ami_name(image):
+    """
+    Return a tuple of the owner and the attributes parsed from the name of a
+    ``describe_images`` image record, or None if the owner is not one of the
+    Ubuntu publishers we know about.
+    """
+    image_owner = image.get("ImageOwnerAlias", image.get("OwnerId"))
+    if image_owner not in AMI_NAMES:
+        return None
+    return AMI_NAMES.parse(image["Name"], image_owner) or (AMI_NAMES.label(image_owner), {})
@@ -0,0 +1,98 @@
+"""
+Compact NDJSON output of scrape results, one record per listing, and the
+reader streaming it, or the indented JSON, back into quicklaunch-report.
+"""
+import gzip
+import json
+import os
+
+import click
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _split_fields(ctx, param, value):
+    if not value:
+        return None
+    return [field.strip() for fields in value for field in fields.split(",") if field.strip()]
+
+
+def ndjson_options(function):
+    """
+    Add the options writing a command's results as NDJSON.
+    """
+    for option in reversed(
+        [
+            click.option(
+                "--ndjson-out",
+                type=click.Path(dir_okay=False),
+                help="Also write one JSON record per listing to this file, "
+                "gzip compressed if it ends with .gz.",
+            ),
+            click.option(
+                "--fields",
+                multiple=True,
+                callback=_split_fields,
+                help="Comma separated fields to keep in each --ndjson-out record. "
+                "Defaults to all of them.",
+            ),
+        ]
+    ):
+        function = option(function)
+    return function
+
+
+def quickstart_records(quickstart_entries):
+    """
+    Return a record of each listing in a list of (region, listings) tuples
+    with its region added.
+    """
+    for region, listings in quickstart_entries:
+        for listing in listings:
+            yield dict({"region": region}, **listing)
+
+
+def marketplace_records(products_by_page):
+    for page, products in products_by_page:
+        yield from products
+
+
+def write_ndjson(path, records, fields=None, keep_fields=()):
+    """
+    Write ``records`` to ``path`` as NDJSON, gzip compressed if ``path`` ends
+    with .gz, keeping only ``fields`` and ``keep_fields`` of each if
+    ``fields`` is given. Returns the number of records written.
+    """
+    if fields:
+        fields = list(keep_fields) + [field for field in fields if field not in keep_fields]
+    opener = gzip.open if path.endswith(".gz") else open
+    count = 0
+    # Write to a temporary file first so a killed run leaves no partial file
+    with opener(path + ".tmp", "wt") as ndjson_file:
+        for record in records:
+            if fields:
+                record = {field: record[field] for field in fields if field in record}
+            ndjson_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+            count += 1
+    os.replace(path + ".tmp", path)
+    return count
+
+
+def read_quickstart_records(scraper_data):
+    """
+    Yield the (region, listing) pairs of scraper data opened as a buffered
+    binary file, either the indented quickstart_entries.json or NDJSON
+    written by ``write_ndjson``, gzip compressed or not. NDJSON is read one
+    line at a time rather than loaded whole.
+    """
+    if scraper_data.peek(2)[:2] == GZIP_MAGIC:
+        scraper_data = gzip.GzipFile(fileobj=scraper_data)
+    if scraper_data.peek(1)[:1] == b"[":
+        for region, listings in sorted(json.load(scraper_data), key=lambda tup: tup[0]):
+            for listing in listings:
+                yield (region, listing)
+        return
+    for line in scraper_data:
+        if line.strip():
+            record = json.loads(line)
+            yield (record["region"], record)
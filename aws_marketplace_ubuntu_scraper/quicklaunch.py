@@ -0,0 +1,587 @@
+"""
+The ``quicklaunch`` command, scraping the Ubuntu quickstart listings of every
+region.
+"""
+import contextlib
+import json
+import os
+import threading
+
+import boto3
+import click
+
+from botocore.config import Config as BotocoreConfig
+from botocore.exceptions import BotoCoreError, ClientError as botocoreClientError
+from joblib import Parallel, delayed
+
+from aws_marketplace_ubuntu_scraper.ami import RecordedEc2Client, get_ubuntu_quickstart_listings
+from aws_marketplace_ubuntu_scraper.browser import (
+    BROWSER_MEMORY_MB,
+    QUICKSTART_CAPTURE_POLL_INTERVAL,
+    QUICKSTART_CAPTURE_TIMEOUT,
+    QUICKSTART_LIST_CALL,
+    BrowserSessionPool,
+    SeleniumTimeoutException,
+    WebDriverException,
+    browser_session_count,
+    capture_quickstart_list,
+    get_regions,
+)
+from aws_marketplace_ubuntu_scraper.cache import AMI_CACHE_PATH, AmiCache
+from aws_marketplace_ubuntu_scraper.checkpoint import QUICKSTART_CHECKPOINT_PATH, QuickstartCheckpoint
+from aws_marketplace_ubuntu_scraper.history import HistoryStore, history_db_option
+from aws_marketplace_ubuntu_scraper.output import ndjson_options, quickstart_records, write_ndjson
+from aws_marketplace_ubuntu_scraper.quickstart_http import QUICKSTART_HTTP_WORKERS, QuickstartListClient
+from aws_marketplace_ubuntu_scraper.regions import discover_regions, region_options
+from aws_marketplace_ubuntu_scraper.timing import Timings, check_metrics_out, peak_rss, timed
+from aws_marketplace_ubuntu_scraper.validation import (
+    DEFAULT_VALIDATION_CONFIG,
+    load_validation_config,
+    print_issues,
+    print_quickstart_entries,
+    validate_quickstart_entries,
+)
+
+
+# A region's EC2 client is only used by the thread scraping that region at
+# a time, so it needs few connections.
+EC2_MAX_POOL_CONNECTIONS = 4
+EC2_MAX_ATTEMPTS = 8
+# The fields of each listing quicklaunch-report reads
+QUICKSTART_REPORT_FIELDS = (
+    "region",
+    "owner",
+    "release_version",
+    "listing_arch",
+    "quickstart_slot",
+    "imageId64",
+    "imageIdArm64",
+)
+
+
+def iam_options(function):
+    """
+    Add the options giving the IAM user the browser signs in to the console
+    as. They are only required when a browser is used, see check_iam_options.
+    """
+    for option in reversed(
+        [
+            click.option("--iam-account-id", envvar="IAM_ACCOUNT_ID", help="IAM User account ID"),
+            click.option("--iam-username", envvar="IAM_USERNAME", help="IAM username"),
+            click.option("--iam-password", envvar="IAM_PASSWORD", help="IAM User password"),
+        ]
+    ):
+        function = option(function)
+    return function
+
+
+def check_iam_options(iam_account_id, iam_username, iam_password):
+    for option_name, value in (
+        ("--iam-account-id", iam_account_id),
+        ("--iam-username", iam_username),
+        ("--iam-password", iam_password),
+    ):
+        if not value:
+            raise click.UsageError("Missing option '{}'.".format(option_name))
+
+
+def scrape_options(function):
+    """
+    Add the options controlling how the quickstart lists are captured and
+    the AMIs described, shared by quicklaunch and quicklaunch-worker.
+    """
+    for option in reversed(
+        [
+            click.option(
+                "--headless/--no-headless",
+                default=True,
+                help="Use selenium in headless mode to avoid Firefox browser opening",
+            ),
+            click.option(
+                "--browser-sessions",
+                type=click.IntRange(min=1),
+                help="Number of signed in browser sessions shared by all regions. "
+                "Defaults to as many as fit in the available memory.",
+            ),
+            click.option(
+                "--browser-memory",
+                type=click.IntRange(min=1),
+                default=BROWSER_MEMORY_MB,
+                show_default=True,
+                help="MB of memory to allow for each browser session when sizing the pool.",
+            ),
+            click.option(
+                "--block-assets/--no-block-assets",
+                default=True,
+                help="Stop the browser loading images, web fonts and trackers.",
+            ),
+            click.option(
+                "--direct-http/--no-direct-http",
+                default=False,
+                help="Fetch the quickstart lists over HTTP with the cookies of a single "
+                "browser session, falling back to the browser for regions that fail.",
+            ),
+            click.option(
+                "--ami-cache/--no-ami-cache",
+                default=True,
+                help="Cache AMI details on disk so unchanged AMIs are not described again.",
+            ),
+            click.option(
+                "--ami-cache-path",
+                type=click.Path(dir_okay=False),
+                default=AMI_CACHE_PATH,
+                show_default=True,
+                help="Path of the AMI details cache.",
+            ),
+            click.option(
+                "--capture-timeout",
+                type=float,
+                default=QUICKSTART_CAPTURE_TIMEOUT,
+                show_default=True,
+                help="Seconds to wait for the quickstart list in each region.",
+            ),
+            click.option(
+                "--capture-poll-interval",
+                type=float,
+                default=QUICKSTART_CAPTURE_POLL_INTERVAL,
+                show_default=True,
+                help="Seconds between checks for the quickstart list.",
+            ),
+        ]
+    ):
+        function = option(function)
+    return function
+
+
+def ami_metadata_option(function):
+    return click.option(
+        "--ami-metadata",
+        type=click.Path(exists=True),
+        help="Describe AMIs from a directory of {region}.json describe_images "
+        "responses, or one response for every region, instead of EC2.",
+    )(function)
+
+
+@click.command()
+@iam_options
+@scrape_options
+@click.option(
+    "--parallel/--no-parallel", default=True, help="Query regions in parallel.",
+)
+@region_options
+@click.option(
+    "--validation-config",
+    type=click.File("r"),
+    help="JSON file overriding the expected_listings, max_slot or rules to check.",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    default=QUICKSTART_CHECKPOINT_PATH,
+    show_default=True,
+    help="NDJSON file each region's result is appended to as soon as it completes.",
+)
+@click.option(
+    "--resume/--no-resume",
+    default=False,
+    help="Keep the checkpoint of a previous run and skip the regions it completed.",
+)
+@click.option(
+    "--metrics-out",
+    type=click.Path(dir_okay=False),
+    callback=check_metrics_out,
+    help="Write per-region and per-phase timings to this JSON file, and a "
+    "Prometheus textfile collector file next to it with a .prom extension.",
+)
+@click.option(
+    "--replay",
+    type=click.Path(exists=True, file_okay=False),
+    help="Rebuild the results from the {region}-getQuickstartList.json files a "
+    "previous run saved in this directory instead of scraping the console.",
+)
+@ami_metadata_option
+@history_db_option
+@ndjson_options
+def quicklaunch(
+    iam_account_id,
+    iam_username,
+    iam_password,
+    headless,
+    parallel,
+    only_regions,
+    region_cache_ttl,
+    browser_sessions,
+    browser_memory,
+    block_assets,
+    direct_http,
+    ami_cache,
+    ami_cache_path,
+    capture_timeout,
+    capture_poll_interval,
+    validation_config,
+    checkpoint,
+    resume,
+    metrics_out,
+    replay,
+    ami_metadata,
+    history_db,
+    ndjson_out,
+    fields,
+):
+    if not replay:
+        check_iam_options(iam_account_id, iam_username, iam_password)
+    if ndjson_out and os.path.abspath(ndjson_out) == os.path.abspath(checkpoint):
+        raise click.BadParameter("must not be the --checkpoint file.", param_hint="'--ndjson-out'")
+    validation_config = load_validation_config(validation_config)
+    timings = Timings("quicklaunch") if metrics_out else None
+    quickstart_checkpoint = QuickstartCheckpoint(checkpoint)
+    if not resume:
+        quickstart_checkpoint.reset()
+    completed_regions = quickstart_checkpoint.completed_regions()
+    if replay:
+        browser_pool_context = contextlib.nullcontext()
+    else:
+        if not parallel:
+            browser_sessions = 1
+        elif not browser_sessions:
+            browser_sessions = browser_session_count(browser_memory)
+        print("Using up to {} browser sessions".format(browser_sessions))
+        browser_pool_context = BrowserSessionPool(
+            browser_sessions, iam_account_id, iam_username, iam_password, headless, timings, block_assets
+        )
+    region_client_factory = RecordedEc2Client.factory(ami_metadata) if ami_metadata else ec2_client
+    with browser_pool_context as browser_pool:
+        if replay:
+            region_dict_list = [
+                {"id": region} for region in (only_regions or saved_quickstart_regions(replay))
+            ]
+        else:
+            region_dict_list = discover_regions(
+                only_regions,
+                ec2_client,
+                lambda: get_regions(browser_pool, ()),
+                cache_ttl=region_cache_ttl,
+                timings=timings,
+            )
+        pending_region_dict_list = [
+            region_dict for region_dict in region_dict_list
+            if region_dict["id"] not in completed_regions
+        ]
+        if len(pending_region_dict_list) < len(region_dict_list):
+            print(
+                "Resuming, {} regions already completed".format(
+                    len(region_dict_list) - len(pending_region_dict_list)
+                )
+            )
+        for quickstart_result in scrape_quicklaunch(
+            browser_pool,
+            pending_region_dict_list,
+            ami_cache,
+            ami_cache_path,
+            capture_timeout,
+            capture_poll_interval,
+            direct_http,
+            load_quickstart_payloads(replay, pending_region_dict_list) if replay else None,
+            region_client_factory,
+            timings,
+        ):
+            quickstart_checkpoint.append(*quickstart_result)
+    quickstart_results = quickstart_checkpoint.results([region_dict["id"] for region_dict in region_dict_list])
+    report_quicklaunch(quickstart_results, validation_config, ndjson_out, fields)
+    if history_db:
+        record_history(history_db, quickstart_results)
+    rss = peak_rss()
+    if rss and replay:
+        # No browser was started so there is no child process to report
+        print("Peak RSS: {:.0f} MB scraper".format(rss[0]))
+    elif rss:
+        print("Peak RSS: {:.0f} MB scraper, {:.0f} MB largest browser process".format(*rss))
+    if timings:
+        timings.write(metrics_out)
+
+
+def fetch_quickstart_lists_direct(browser_pool, region_dict_list, capture_timeout, capture_poll_interval):
+    """
+    Capture the quickstart list of the first region with the browser and then
+    fetch the quickstart lists of all the other regions directly over HTTP.
+
+    Returns a dict of region to a tuple of the capture time and the payload.
+    Regions which could not be fetched directly are left out.
+    """
+    region_identifier = region_dict_list[0]["id"]
+    try:
+        with browser_pool.session() as driver:
+            capture_time, request = capture_quickstart_list(
+                driver, browser_pool, region_identifier, capture_timeout, capture_poll_interval
+            )
+    except SeleniumTimeoutException as ste:
+        print(
+            "SeleniumTimeoutException encountered when querying region {} ".format(
+                region_identifier
+            )
+        )
+        print(ste.msg)
+        return {}
+    except WebDriverException as wde:
+        print("{} - Browser failed capturing the quickstart list: {}".format(region_identifier, wde.msg))
+        return {}
+    try:
+        quickstart_lists = {
+            region_identifier: (capture_time, json.loads(request.response.body))
+        }
+    except ValueError as ve:
+        print("{} - Quickstart list is not valid JSON: {}".format(region_identifier, ve))
+        return {}
+    quickstart_list_client = QuickstartListClient.from_captured_request(
+        request, region_identifier, timings=browser_pool.timings
+    )
+    try:
+        quickstart_lists.update(
+            quickstart_list_client.fetch_many(
+                [region_dict["id"] for region_dict in region_dict_list[1:]]
+            )
+        )
+    finally:
+        quickstart_list_client.close()
+    return quickstart_lists
+
+
+def saved_quickstart_regions(payload_dir):
+    """
+    Return the regions with a ``{region}-getQuickstartList.json`` file in
+    ``payload_dir``.
+    """
+    suffix = "-getQuickstartList.json"
+    return sorted(name[:-len(suffix)] for name in os.listdir(payload_dir) if name.endswith(suffix))
+
+
+def load_quickstart_payloads(payload_dir, region_dict_list):
+    """
+    Return a dict of region to a tuple of no capture time and the payload of
+    the ``{region}-getQuickstartList.json`` files a previous scrape saved in
+    ``payload_dir``. Regions without a saved payload are left out.
+    """
+    quickstart_lists = {}
+    for region_dict in region_dict_list:
+        payload_path = os.path.join(payload_dir, "{}-getQuickstartList.json".format(region_dict["id"]))
+        if os.path.exists(payload_path):
+            with open(payload_path) as payload_file:
+                quickstart_lists[region_dict["id"]] = (None, json.load(payload_file))
+    return quickstart_lists
+
+
+class Ec2ClientFactory:
+    """
+    Return an EC2 client for each region created from one shared boto3
+    session, so the EC2 service model is loaded and parsed once rather than
+    for every region, and reused for every later call for the same region.
+
+    Clients retry in adaptive mode, slowing down when EC2 throttles them.
+    """
+
+    def __init__(self, max_pool_connections=EC2_MAX_POOL_CONNECTIONS, max_attempts=EC2_MAX_ATTEMPTS):
+        self.config = BotocoreConfig(
+            max_pool_connections=max_pool_connections,
+            retries={"mode": "adaptive", "max_attempts": max_attempts},
+        )
+        self._session = None
+        self._clients = {}
+        # Clients are thread safe but creating them from a shared session is not
+        self._lock = threading.Lock()
+
+    def __call__(self, region_identifier):
+        with self._lock:
+            if region_identifier not in self._clients:
+                if self._session is None:
+                    self._session = boto3.Session()
+                self._clients[region_identifier] = self._session.client(
+                    "ec2", region_name=region_identifier, config=self.config
+                )
+            return self._clients[region_identifier]
+
+
+ec2_client = Ec2ClientFactory()
+
+
+def scrape_quicklaunch(
+    browser_pool,
+    region_dict_list,
+    ami_cache,
+    ami_cache_path,
+    capture_timeout,
+    capture_poll_interval,
+    direct_http=False,
+    quickstart_lists=None,
+    region_client_factory=ec2_client,
+    timings=None,
+):
+    """
+    Scrape the Ubuntu quickstart listings of every region, sharing the signed
+    in sessions of ``browser_pool`` between them.
+
+    With ``direct_http`` the quickstart lists are fetched without the browser
+    where possible, falling back to the browser for regions that fail.
+    Regions in ``quickstart_lists`` use the payload given there instead, and
+    without a ``browser_pool`` only those regions can be scraped. AMIs are
+    described with the clients ``region_client_factory`` returns. Phases are
+    timed in ``timings``, by default those of ``browser_pool``.
+
+    Yields (region, listings, capture time, error) tuples as each region
+    completes, in the order they complete. ``error`` is None if the region
+    was scraped successfully.
+    """
+    if ami_cache:
+        ami_cache_evictor = AmiCache(ami_cache_path)
+        ami_cache_evictor.evict()
+        ami_cache_evictor.close()
+
+    if timings is None and browser_pool:
+        timings = browser_pool.timings
+    quickstart_lists = dict(quickstart_lists or {})
+    if direct_http and browser_pool and region_dict_list:
+        quickstart_lists.update(
+            fetch_quickstart_lists_direct(
+                browser_pool,
+                [region_dict for region_dict in region_dict_list if region_dict["id"] not in quickstart_lists],
+                capture_timeout,
+                capture_poll_interval,
+            )
+        )
+
+    def scrape_quicklaunch_regions(region_dict):
+        region_identifier = region_dict["id"]
+        print("scraping {} ...".format(region_identifier))
+        region_ami_cache = AmiCache(ami_cache_path) if ami_cache else None
+        ubuntu_quick_start_listings = []
+        capture_time = None
+        error = None
+        try:
+            region_client = region_client_factory(region_identifier)
+            if region_identifier in quickstart_lists:
+                capture_time, region_quickstart_entries = quickstart_lists[region_identifier]
+            elif not browser_pool:
+                print("{} - No quickstart list to scrape".format(region_identifier))
+                return (region_identifier, [], None, "No quickstart list for {}".format(region_identifier))
+            else:
+                with browser_pool.session() as driver:
+                    capture_time, request = capture_quickstart_list(
+                        driver,
+                        browser_pool,
+                        region_identifier,
+                        capture_timeout,
+                        capture_poll_interval,
+                    )
+                region_quickstart_entries = json.loads(request.response.body)
+            with open(
+                "{}-getQuickstartList.json".format(region_identifier), "w"
+            ) as outfile:
+                json.dump(region_quickstart_entries, outfile, indent=4)
+            # Such as an error payload once the session has expired
+            if not isinstance(region_quickstart_entries, dict) or "amiList" not in region_quickstart_entries:
+                raise ValueError("{} response has no amiList".format(QUICKSTART_LIST_CALL))
+
+            ubuntu_quick_start_listings = get_ubuntu_quickstart_listings(
+                region_identifier,
+                region_client,
+                region_quickstart_entries,
+                region_ami_cache,
+                timings,
+            )
+        except SeleniumTimeoutException as ste:
+            print(
+                "SeleniumTimeoutException encountered when querying region {} ".format(
+                    region_identifier
+                )
+            )
+            print(ste.msg)
+            error = "SeleniumTimeoutException: {}".format(ste.msg)
+        except WebDriverException as wde:
+            # Such as a browser crash. The pool has already replaced the
+            # driver so the other regions carry on.
+            print("WebDriverException encountered when querying region {} ".format(region_identifier))
+            print(wde.msg)
+            error = "WebDriverException: {}".format(wde.msg)
+        except ValueError as ve:
+            print("Invalid quickstart list for region {} ".format(region_identifier))
+            print(ve)
+            error = "ValueError: {}".format(ve)
+        except (KeyError, TypeError) as malformed_error:
+            # A listing in the quickstart list missing a field or of the wrong shape
+            print("Malformed quickstart list for region {} ".format(region_identifier))
+            print(repr(malformed_error))
+            error = "{}: {}".format(type(malformed_error).__name__, malformed_error)
+        except botocoreClientError as bce:
+            print(
+                "botocoreClientError encountered when AMI for region {} ".format(
+                    region_identifier
+                )
+            )
+            print(bce)
+            error = "botocoreClientError: {}".format(bce)
+        except BotoCoreError as bce:
+            # Such as missing credentials or an unreachable endpoint
+            print("BotoCoreError encountered when querying AMIs for region {} ".format(region_identifier))
+            print(bce)
+            error = "{}: {}".format(type(bce).__name__, bce)
+        finally:
+            if region_ami_cache:
+                region_ami_cache.close()
+        return (region_identifier, ubuntu_quick_start_listings, capture_time, error)
+
+    def timed_scrape_quicklaunch_regions(region_dict):
+        with timed(timings, "region", region=region_dict["id"]):
+            return scrape_quicklaunch_regions(region_dict)
+
+    # Drivers can not be shared between processes so regions are scraped in
+    # threads, one per browser session, and the other regions wait for one
+    # of them to finish.
+    yield from Parallel(
+        n_jobs=browser_pool.size if browser_pool else QUICKSTART_HTTP_WORKERS,
+        prefer="threads",
+        return_as="generator_unordered",
+    )(
+        delayed(timed_scrape_quicklaunch_regions)(region_dict)
+        for region_dict in region_dict_list
+    )
+
+
+def report_quicklaunch(
+    quickstart_results, validation_config=DEFAULT_VALIDATION_CONFIG, ndjson_out=None, fields=None
+):
+    sorted_parallel_quickstart_entries = sorted(
+        [(region, listings) for region, listings, capture_time, error in quickstart_results],
+        key=lambda tup: tup[0],
+    )
+
+    print("Quickstart list capture times")
+    for region, listings, capture_time, error in sorted(quickstart_results, key=lambda tup: tup[0]):
+        print(
+            "\t{} {}".format(
+                region, "{:.2f}s".format(capture_time) if capture_time is not None else "not captured"
+            )
+        )
+    print()
+
+    with open("quickstart_entries.json", "w") as quickstart_entries_json:
+        json.dump(sorted_parallel_quickstart_entries, quickstart_entries_json, indent=4)
+    if ndjson_out:
+        # The fields quicklaunch-report reads are always kept
+        record_count = write_ndjson(
+            ndjson_out,
+            quickstart_records(sorted_parallel_quickstart_entries),
+            fields,
+            keep_fields=QUICKSTART_REPORT_FIELDS,
+        )
+        print("Wrote {} listings to {}".format(record_count, ndjson_out))
+
+    print_quickstart_entries(sorted_parallel_quickstart_entries)
+    print_issues(validate_quickstart_entries(sorted_parallel_quickstart_entries, validation_config))
+
+
+def record_history(history_db, quickstart_results):
+    history = HistoryStore(history_db)
+    try:
+        run_id = history.record_quicklaunch(quickstart_results)
+    finally:
+        history.close()
+    print("Recorded run {} in {}".format(run_id, history_db))
@@ -0,0 +1,102 @@
+"""
+Replay a captured ``getQuickstartList`` request for other regions without a
+browser.
+"""
+import time
+
+import requests
+
+from joblib import Parallel, delayed
+from requests.adapters import HTTPAdapter
+
+from aws_marketplace_ubuntu_scraper.browser import QUICKSTART_LIST_CALL
+
+# Concurrent requests when fetching quickstart lists without a browser
+QUICKSTART_HTTP_WORKERS = 8
+
+
+class QuickstartListClient:
+    """
+    Fetch ``getQuickstartList`` payloads over HTTP without a browser.
+
+    The request the console made for one region is replayed, with the
+    browser's cookies and headers, for every other region by replacing the
+    region identifier in its URL, headers and body.
+    """
+
+    # Headers which requests works out itself for each request
+    skip_headers = ("Host", "Content-Length", "Connection")
+
+    def __init__(
+        self, method, url, headers, body, region, pool_size=QUICKSTART_HTTP_WORKERS, timeout=30, timings=None
+    ):
+        self.method = method
+        self.url = url
+        self.headers = {
+            key: value for key, value in headers.items() if key not in self.skip_headers
+        }
+        self.body = body
+        self.region = region
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.timings = timings
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_captured_request(cls, request, region, **kwargs):
+        return cls(request.method, request.path, dict(request.headers), request.body, region, **kwargs)
+
+    def _for_region(self, value, region):
+        if isinstance(value, bytes):
+            return value.replace(self.region.encode(), region.encode())
+        return value.replace(self.region, region)
+
+    def fetch(self, region):
+        """
+        Return the quickstart list payload of ``region``.
+
+        Raises a requests.RequestException or ValueError if the console does
+        not return a quickstart list.
+        """
+        response = self.session.request(
+            self.method,
+            self._for_region(self.url, region),
+            headers={key: self._for_region(value, region) for key, value in self.headers.items()},
+            data=self._for_region(self.body, region) if self.body else None,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        region_quickstart_entries = response.json()
+        if "amiList" not in region_quickstart_entries:
+            raise ValueError("{} response has no amiList".format(QUICKSTART_LIST_CALL))
+        return region_quickstart_entries
+
+    def fetch_many(self, regions):
+        """
+        Fetch the quickstart lists of ``regions`` in parallel.
+
+        Returns a dict of region to a tuple of the fetch time and the payload.
+        Regions that could not be fetched are left out.
+        """
+        def fetch_region(region):
+            fetch_start = time.time()
+            try:
+                region_quickstart_entries = self.fetch(region)
+            except (requests.RequestException, ValueError) as error:
+                print("{} - Direct quickstart list request failed: {}".format(region, error))
+                return (region, None)
+            fetch_time = time.time() - fetch_start
+            if self.timings:
+                self.timings.record("quickstart_http_fetch", fetch_time, region=region)
+            return (region, (fetch_time, region_quickstart_entries))
+
+        fetched = Parallel(n_jobs=self.pool_size, prefer="threads")(
+            delayed(fetch_region)(region) for region in regions
+        )
+        return {region: result for region, result in fetched if result}
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,174 @@
+"""
+Discovery of the regions to scrape without starting a browser where
+possible: from a cache, then EC2, then the console.
+"""
+import json
+import os
+import time
+
+import click
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from aws_marketplace_ubuntu_scraper.cache import CACHE_DIR
+from aws_marketplace_ubuntu_scraper.timing import timed
+
+REGION_CACHE_PATH = os.path.join(CACHE_DIR, "regions.json")
+REGION_CACHE_TTL = 24 * 60 * 60
+# Region whose EC2 endpoint lists the regions
+REGION_LISTING_REGION = "us-east-1"
+# Region to the name and location the console lists it under
+REGION_NAMES = {
+    "af-south-1": ("Africa", "Cape Town"),
+    "ap-east-1": ("Asia Pacific", "Hong Kong"),
+    "ap-northeast-1": ("Asia Pacific", "Tokyo"),
+    "ap-northeast-2": ("Asia Pacific", "Seoul"),
+    "ap-northeast-3": ("Asia Pacific", "Osaka"),
+    "ap-south-1": ("Asia Pacific", "Mumbai"),
+    "ap-south-2": ("Asia Pacific", "Hyderabad"),
+    "ap-southeast-1": ("Asia Pacific", "Singapore"),
+    "ap-southeast-2": ("Asia Pacific", "Sydney"),
+    "ap-southeast-3": ("Asia Pacific", "Jakarta"),
+    "ap-southeast-4": ("Asia Pacific", "Melbourne"),
+    "ca-central-1": ("Canada", "Central"),
+    "ca-west-1": ("Canada West", "Calgary"),
+    "eu-central-1": ("Europe", "Frankfurt"),
+    "eu-central-2": ("Europe", "Zurich"),
+    "eu-north-1": ("Europe", "Stockholm"),
+    "eu-south-1": ("Europe", "Milan"),
+    "eu-south-2": ("Europe", "Spain"),
+    "eu-west-1": ("Europe", "Ireland"),
+    "eu-west-2": ("Europe", "London"),
+    "eu-west-3": ("Europe", "Paris"),
+    "il-central-1": ("Israel", "Tel Aviv"),
+    "me-central-1": ("Middle East", "UAE"),
+    "me-south-1": ("Middle East", "Bahrain"),
+    "sa-east-1": ("South America", "São Paulo"),
+    "us-east-1": ("US East", "N. Virginia"),
+    "us-east-2": ("US East", "Ohio"),
+    "us-west-1": ("US West", "N. California"),
+    "us-west-2": ("US West", "Oregon"),
+}
+# Regions which can be used without opting in or have been opted in to
+ENABLED_OPT_IN_STATUSES = ("opt-in-not-required", "opted-in")
+
+
+def region_dict(region_identifier):
+    """
+    Return a region in the shape the console lists them, such as
+    {"name": "US East", "location": "N. Virginia", "id": "us-east-1"}.
+    """
+    name, location = REGION_NAMES.get(region_identifier, (region_identifier, ""))
+    return {"name": name, "location": location, "id": region_identifier}
+
+
+def load_cached_regions(path=REGION_CACHE_PATH, ttl=REGION_CACHE_TTL):
+    """
+    Return the cached regions, or None if they are older than ``ttl``
+    seconds or not cached.
+    """
+    try:
+        if time.time() - os.path.getmtime(path) >= ttl:
+            return None
+        with open(path) as region_cache_file:
+            return json.load(region_cache_file)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_regions(regions, path=REGION_CACHE_PATH):
+    cache_dir = os.path.dirname(path)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    with open(path + ".tmp", "w") as region_cache_file:
+        json.dump(regions, region_cache_file, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def describe_regions(region_client):
+    """
+    Return the regions enabled for the account of ``region_client``, an EC2
+    client, sorted by ID.
+    """
+    response = region_client.describe_regions(
+        AllRegions=True,
+        Filters=[{"Name": "opt-in-status", "Values": list(ENABLED_OPT_IN_STATUSES)}],
+    )
+    return [
+        region_dict(region["RegionName"])
+        for region in sorted(response["Regions"], key=lambda region: region["RegionName"])
+        if region.get("OptInStatus", "opt-in-not-required") in ENABLED_OPT_IN_STATUSES
+    ]
+
+
+def region_options(function):
+    """
+    Add the options choosing the regions to scrape and how they are
+    discovered.
+    """
+    for option in reversed(
+        [
+            click.option(
+                "--only-regions",
+                multiple=True,
+                default=[],
+                help="Only scrape these regions, skipping those not enabled for the account. "
+                "Known regions are not checked while the list of regions is not cached.",
+            ),
+            click.option(
+                "--region-cache-ttl",
+                type=click.IntRange(min=0),
+                default=REGION_CACHE_TTL,
+                show_default=True,
+                help="Seconds the list of regions is cached for. 0 lists them again.",
+            ),
+        ]
+    ):
+        function = option(function)
+    return function
+
+
+def discover_regions(
+    only_regions=(),
+    region_client_factory=None,
+    browser_regions=None,
+    cache_path=REGION_CACHE_PATH,
+    cache_ttl=REGION_CACHE_TTL,
+    timings=None,
+):
+    """
+    Return the regions to scrape, all of them or those in ``only_regions``
+    which are enabled for the account.
+
+    The regions are read from the cache at ``cache_path`` if it is younger
+    than ``cache_ttl`` seconds. Otherwise, if every region in ``only_regions``
+    is known, they are used as they are without checking they are enabled,
+    saving the listing. Otherwise the regions are listed with
+    ``describe_regions`` with the EC2 client ``region_client_factory`` returns
+    for a region, or else by calling ``browser_regions``, and cached.
+    """
+    regions = load_cached_regions(cache_path, cache_ttl)
+    if regions is None and only_regions and all(region in REGION_NAMES for region in only_regions):
+        return [region_dict(region) for region in only_regions]
+
+    if regions is None:
+        if region_client_factory:
+            try:
+                with timed(timings, "describe_regions"):
+                    regions = describe_regions(region_client_factory(REGION_LISTING_REGION))
+            except (BotoCoreError, ClientError) as error:
+                # Such as missing credentials or permissions
+                print("Listing the regions with EC2 failed, using the console: {}".format(error))
+        if regions is None and browser_regions:
+            regions = browser_regions()
+        if regions is None:
+            raise RuntimeError("Could not list the regions")
+        save_cached_regions(regions, cache_path)
+
+    if only_regions:
+        enabled_regions = {region["id"] for region in regions}
+        skipped_regions = [region for region in only_regions if region not in enabled_regions]
+        if skipped_regions:
+            print("Skipping regions not enabled for the account: {}".format(", ".join(skipped_regions)))
+        return [region for region in regions if region["id"] in only_regions]
+    return regions
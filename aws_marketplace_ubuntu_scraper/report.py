@@ -0,0 +1,67 @@
+"""
+The ``quicklaunch-report`` command, comparing scraped quickstart listings
+with the latest published AMIs.
+"""
+import sys
+
+import click
+
+from aws_marketplace_ubuntu_scraper.output import read_quickstart_records
+from aws_marketplace_ubuntu_scraper.streams import STREAMS_URL, StreamsIndex
+
+
+@click.command(name='quicklaunch-report')
+@click.option(
+    '--scraper-data', type=click.File('rb'), required=True,
+    show_default=True, default='quickstart_entries.json',
+    help='quickstart_entries.json or the NDJSON written by quicklaunch --ndjson-out, optionally gzipped'
+)
+@click.option('--needs-update-only/--no-needs-update-only',
+              show_default=True, default=False)
+@click.option('--streams', show_default=True, default=STREAMS_URL,
+              help='URL or file of the AWS released image-ids streams document, or the '
+                   'directory of a mirror of the released images containing streams/v1')
+def quicklaunch_report(scraper_data, needs_update_only, streams):
+    """
+    Print a table with which shows if the quickstart entries are up-to-date.
+    This is checked against streams.
+
+    Returns 0 if everything is fine (no updates needed)
+
+    Returns 2 if updates are needed
+
+    All other return codes indicate a failure in the software
+    """
+    from prettytable import PrettyTable
+    t = PrettyTable()
+    t.field_names = ['Region', 'Release', 'Arch', 'Position', 'Quickstart AMI', 'Streams AMI', 'Needs update']
+    streams_index = StreamsIndex.load(streams)
+    needs_any_update = False
+    checking_region = None
+    for region, ami in read_quickstart_records(scraper_data):
+        if region != checking_region:
+            print(f'Checking region {region} ...')
+            checking_region = region
+        if ami['owner'] != 'Canonical':
+            # skip Amazon owned images for now in the report
+            continue
+        if ami['listing_arch'] == 'amd64':
+            ami_id = ami['imageId64']
+        elif ami['listing_arch'] == 'arm64':
+            ami_id = ami['imageIdArm64']
+        else:
+            raise Exception('Unknown architecture {}'.format(ami['arch']))
+        streams_ami_id = streams_index.get_image(region, ami['release_version'], ami['listing_arch'])
+        needs_update = ami_id != streams_ami_id
+        if needs_update:
+            needs_any_update = True
+        if not needs_update_only or needs_update:
+            t.add_row([region, ami['release_version'], ami['listing_arch'],
+                       ami['quickstart_slot'], ami_id, streams_ami_id, needs_update])
+    if needs_any_update:
+        print(t.get_string(sortby='Region', reversesort=True))
+        click.echo("There are some updates needed")
+        # do return 2 which can then be checked in automation if updates are needed
+        sys.exit(2)
+    else:
+        click.echo('No updates needed')
@@ -0,0 +1,398 @@
+"""
+Coordinator and worker commands splitting a quicklaunch scrape across
+processes or hosts through a work queue of region shards in a shared
+directory.
+"""
+import contextlib
+import json
+import os
+import socket
+import time
+
+import click
+
+from aws_marketplace_ubuntu_scraper.ami import RecordedEc2Client
+from aws_marketplace_ubuntu_scraper.browser import BrowserSessionPool, browser_session_count, get_regions
+from aws_marketplace_ubuntu_scraper.history import history_db_option
+from aws_marketplace_ubuntu_scraper.output import ndjson_options
+from aws_marketplace_ubuntu_scraper.quicklaunch import (
+    ami_metadata_option,
+    check_iam_options,
+    ec2_client,
+    iam_options,
+    load_quickstart_payloads,
+    record_history,
+    report_quicklaunch,
+    scrape_options,
+    scrape_quicklaunch,
+)
+from aws_marketplace_ubuntu_scraper.regions import discover_regions, region_options
+from aws_marketplace_ubuntu_scraper.validation import load_validation_config
+
+SHARD_SIZE = 4
+# Seconds a worker may hold a shard before it is handed to another worker
+SHARD_CLAIM_TIMEOUT = 30 * 60
+SHARD_POLL_INTERVAL = 5
+
+
+class Shard:
+    def __init__(self, name, regions, claimed_path):
+        self.name = name
+        self.regions = regions
+        self.claimed_path = claimed_path
+
+
+class ShardQueue:
+    """
+    Work queue of region shards in a directory shared by the coordinator and
+    its workers, such as a local directory or an NFS mount.
+
+    Each shard is a JSON file which moves from pending/ to claimed/ when a
+    worker claims it and whose results are written to done/. Claims are
+    atomic renames so a shard is only ever claimed by one worker.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.closed_path = os.path.join(path, "closed.json")
+        self.pending_dir = os.path.join(path, "pending")
+        self.claimed_dir = os.path.join(path, "claimed")
+        self.done_dir = os.path.join(path, "done")
+
+    def _write(self, path, data):
+        # Write to a temporary file first so readers never see a partial file
+        with open(path + ".tmp", "w") as shard_file:
+            json.dump(data, shard_file)
+        os.replace(path + ".tmp", path)
+
+    def _read(self, path):
+        with open(path) as shard_file:
+            return json.load(shard_file)
+
+    def create(self, region_dict_list, shard_size=SHARD_SIZE):
+        """
+        Queue ``region_dict_list`` in shards of ``shard_size`` regions,
+        replacing anything left in the queue by a previous run.
+        """
+        for directory in (self.pending_dir, self.claimed_dir, self.done_dir):
+            os.makedirs(directory, exist_ok=True)
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+        for path in (self.manifest_path, self.closed_path):
+            if os.path.exists(path):
+                os.remove(path)
+        shard_names = []
+        for shard_start in range(0, len(region_dict_list), shard_size):
+            shard_name = "shard-{:04d}.json".format(len(shard_names) + 1)
+            self._write(
+                os.path.join(self.pending_dir, shard_name),
+                region_dict_list[shard_start:shard_start + shard_size],
+            )
+            shard_names.append(shard_name)
+        # Workers only start claiming once the manifest exists
+        self._write(self.manifest_path, {"shards": shard_names, "created": time.time()})
+        return shard_names
+
+    def wait_until_created(self, timeout, poll_interval=1):
+        deadline = time.time() + timeout
+        while not os.path.exists(self.manifest_path):
+            if time.time() >= deadline:
+                return False
+            time.sleep(poll_interval)
+        return True
+
+    def claim(self, worker_id):
+        """
+        Return the next pending shard claimed for ``worker_id``, or None if
+        there are no pending shards.
+        """
+        for shard_name in sorted(os.listdir(self.pending_dir)):
+            if not shard_name.endswith(".json"):
+                continue
+            pending_path = os.path.join(self.pending_dir, shard_name)
+            claimed_path = os.path.join(self.claimed_dir, "{}.{}".format(shard_name, worker_id))
+            try:
+                # The modification time is when the claim goes stale from and
+                # renaming keeps it, so set it before the shard is claimed
+                # rather than leave a window where a new claim looks stale.
+                os.utime(pending_path)
+                os.rename(pending_path, claimed_path)
+                return Shard(shard_name, self._read(claimed_path), claimed_path)
+            except FileNotFoundError:
+                # Another worker claimed it first, or the claim was requeued
+                # before it could be read
+                continue
+        return None
+
+    def complete(self, shard, results):
+        self._write(os.path.join(self.done_dir, shard.name), results)
+        try:
+            os.remove(shard.claimed_path)
+        except FileNotFoundError:
+            # The claim went stale and was handed to another worker
+            pass
+
+    def requeue_stale(self, claim_timeout=SHARD_CLAIM_TIMEOUT):
+        """
+        Return shards claimed more than ``claim_timeout`` seconds ago without
+        completing to the pending shards, such as those of a worker which
+        died. Returns the names of the requeued shards.
+        """
+        requeued = []
+        for claimed_name in os.listdir(self.claimed_dir):
+            claimed_path = os.path.join(self.claimed_dir, claimed_name)
+            shard_name = claimed_name.split(".json", 1)[0] + ".json"
+            try:
+                if time.time() - os.path.getmtime(claimed_path) < claim_timeout:
+                    continue
+                if os.path.exists(os.path.join(self.done_dir, shard_name)):
+                    os.remove(claimed_path)
+                    continue
+                os.rename(claimed_path, os.path.join(self.pending_dir, shard_name))
+            except FileNotFoundError:
+                continue
+            requeued.append(shard_name)
+        return requeued
+
+    def close(self):
+        """
+        Tell the workers the coordinator is no longer waiting for shards.
+        """
+        self._write(self.closed_path, {"closed": time.time()})
+
+    def closed(self):
+        return os.path.exists(self.closed_path)
+
+    def shard_names(self):
+        return self._read(self.manifest_path)["shards"]
+
+    def unfinished(self):
+        return [
+            shard_name for shard_name in self.shard_names()
+            if not os.path.exists(os.path.join(self.done_dir, shard_name))
+        ]
+
+    def results(self):
+        """
+        Return the (region, listings, capture time, error) tuples of every
+        completed shard.
+        """
+        results = []
+        for shard_name in self.shard_names():
+            done_path = os.path.join(self.done_dir, shard_name)
+            if os.path.exists(done_path):
+                results.extend(tuple(result) for result in self._read(done_path))
+        return results
+
+
+@click.command(name="quicklaunch-coordinator")
+@iam_options
+@click.option(
+    "--queue-dir",
+    type=click.Path(file_okay=False),
+    required=True,
+    help="Directory shared with the workers to queue the region shards in.",
+)
+@region_options
+@click.option(
+    "--shard-size",
+    type=click.IntRange(min=1),
+    default=SHARD_SIZE,
+    show_default=True,
+    help="Number of regions in each shard.",
+)
+@click.option(
+    "--claim-timeout",
+    type=click.IntRange(min=1),
+    default=SHARD_CLAIM_TIMEOUT,
+    show_default=True,
+    help="Seconds a worker may take over a shard before it is handed to another worker.",
+)
+@click.option(
+    "--timeout",
+    type=click.IntRange(min=1),
+    help="Seconds to wait for the workers before reporting the shards completed so far.",
+)
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=SHARD_POLL_INTERVAL,
+    show_default=True,
+    help="Seconds between checks for completed shards.",
+)
+@click.option(
+    "--headless/--no-headless",
+    default=True,
+    help="Use selenium in headless mode to avoid Firefox browser opening",
+)
+@click.option(
+    "--validation-config",
+    type=click.File("r"),
+    help="JSON file overriding the expected_listings, max_slot or rules to check.",
+)
+@history_db_option
+@ndjson_options
+def quicklaunch_coordinator(
+    iam_account_id,
+    iam_username,
+    iam_password,
+    queue_dir,
+    only_regions,
+    region_cache_ttl,
+    shard_size,
+    claim_timeout,
+    timeout,
+    poll_interval,
+    headless,
+    validation_config,
+    history_db,
+    ndjson_out,
+    fields,
+):
+    """
+    Queue the regions in shards for quicklaunch-worker processes and report
+    their merged results.
+    """
+    validation_config = load_validation_config(validation_config)
+
+    def browser_regions():
+        check_iam_options(iam_account_id, iam_username, iam_password)
+        with BrowserSessionPool(1, iam_account_id, iam_username, iam_password, headless) as browser_pool:
+            return get_regions(browser_pool, ())
+
+    region_dict_list = discover_regions(only_regions, ec2_client, browser_regions, cache_ttl=region_cache_ttl)
+
+    shard_queue = ShardQueue(queue_dir)
+    shard_names = shard_queue.create(region_dict_list, shard_size)
+    print("Queued {} regions in {} shards in {}".format(len(region_dict_list), len(shard_names), queue_dir))
+
+    deadline = time.time() + timeout if timeout else None
+    unfinished = shard_queue.unfinished()
+    while unfinished:
+        if deadline and time.time() >= deadline:
+            print("Timed out waiting for shards {}".format(", ".join(unfinished)))
+            break
+        for shard_name in shard_queue.requeue_stale(claim_timeout):
+            print("Requeued stale shard {}".format(shard_name))
+        time.sleep(poll_interval)
+        unfinished = shard_queue.unfinished()
+
+    shard_queue.close()
+    quickstart_results = shard_queue.results()
+    report_quicklaunch(quickstart_results, validation_config, ndjson_out, fields)
+    if history_db:
+        record_history(history_db, quickstart_results)
+
+
+@click.command(name="quicklaunch-worker")
+@iam_options
+@scrape_options
+@click.option(
+    "--queue-dir",
+    type=click.Path(file_okay=False),
+    required=True,
+    help="Directory the coordinator queues the region shards in.",
+)
+@click.option(
+    "--worker-id",
+    default="{}-{}".format(socket.gethostname(), os.getpid()),
+    help="Name of this worker in the shards it claims.  [default: host name and process ID]",
+)
+@click.option(
+    "--wait",
+    type=click.IntRange(min=0),
+    default=60,
+    show_default=True,
+    help="Seconds to wait for the coordinator to queue the shards.",
+)
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=SHARD_POLL_INTERVAL,
+    show_default=True,
+    help="Seconds between checks for requeued shards once none are pending.",
+)
+@click.option(
+    "--local-workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of workers running on this host, which share its memory when "
+    "sizing each worker's browser pool without --browser-sessions.",
+)
+@click.option(
+    "--payload-dir",
+    type=click.Path(exists=True, file_okay=False),
+    help="Scrape the {region}-getQuickstartList.json files saved in this "
+    "directory instead of capturing the quickstart lists with a browser.",
+)
+@ami_metadata_option
+def quicklaunch_worker(
+    iam_account_id,
+    iam_username,
+    iam_password,
+    headless,
+    browser_sessions,
+    browser_memory,
+    block_assets,
+    direct_http,
+    ami_cache,
+    ami_cache_path,
+    capture_timeout,
+    capture_poll_interval,
+    queue_dir,
+    worker_id,
+    wait,
+    poll_interval,
+    local_workers,
+    payload_dir,
+    ami_metadata,
+):
+    """
+    Scrape the region shards queued by quicklaunch-coordinator until none
+    are left.
+    """
+    shard_queue = ShardQueue(queue_dir)
+    if not shard_queue.wait_until_created(wait):
+        raise click.ClickException("No shards were queued in {}".format(queue_dir))
+    if payload_dir:
+        browser_pool_context = contextlib.nullcontext()
+    else:
+        check_iam_options(iam_account_id, iam_username, iam_password)
+        browser_pool_context = BrowserSessionPool(
+            browser_sessions or browser_session_count(browser_memory, processes=local_workers),
+            iam_account_id,
+            iam_username,
+            iam_password,
+            headless,
+            block_assets=block_assets,
+        )
+    region_client_factory = RecordedEc2Client.factory(ami_metadata) if ami_metadata else ec2_client
+
+    with browser_pool_context as browser_pool:
+        while True:
+            shard = shard_queue.claim(worker_id)
+            if shard is None:
+                # A shard claimed by a worker which died is requeued, so keep
+                # waiting until every shard is done or the coordinator gives up
+                if shard_queue.closed() or not shard_queue.unfinished():
+                    break
+                time.sleep(poll_interval)
+                continue
+            print("{} - Claimed {}".format(worker_id, shard.name))
+            results = list(
+                scrape_quicklaunch(
+                    browser_pool,
+                    shard.regions,
+                    ami_cache,
+                    ami_cache_path,
+                    capture_timeout,
+                    capture_poll_interval,
+                    direct_http,
+                    load_quickstart_payloads(payload_dir, shard.regions) if payload_dir else None,
+                    region_client_factory,
+                )
+            )
+            shard_queue.complete(shard, results)
+            print("{} - Completed {}".format(worker_id, shard.name))
@@ -0,0 +1,90 @@
+"""
+Index of the latest AMIs published in the simplestreams image-ids data.
+"""
+import json
+import os
+
+STREAMS_URL = "https://cloud-images.ubuntu.com/releases/streams/v1/com.ubuntu.cloud:released:aws.json"
+# Paths of the document under the root of a mirror of the released images,
+# unsigned first
+STREAMS_MIRROR_PATHS = (
+    os.path.join('streams', 'v1', 'com.ubuntu.cloud:released:aws.json'),
+    os.path.join('streams', 'v1', 'com.ubuntu.cloud:released:aws.sjson'),
+)
+
+
+class StreamsIndex:
+    """
+    In-memory index of the latest AMI ID in a simplestreams image-ids document
+    by (region, release version, arch, virt, root store).
+    """
+
+    # Index keys in the order they are looked up. Values can be set on the
+    # document, product, version or item and are inherited downwards.
+    index_keys = ('crsn', 'version', 'arch', 'virt', 'root_store')
+
+    def __init__(self, streams_data):
+        self._latest = {}
+        inherited = {key: streams_data[key] for key in self.index_keys if key in streams_data}
+        for product in streams_data.get('products', {}).values():
+            product_fields = dict(inherited, **{key: product[key] for key in self.index_keys if key in product})
+            for serial, version in product.get('versions', {}).items():
+                version_fields = dict(
+                    product_fields, **{key: version[key] for key in self.index_keys if key in version}
+                )
+                for item in version.get('items', {}).values():
+                    if 'id' not in item:
+                        continue
+                    item_fields = dict(version_fields, **{key: item[key] for key in self.index_keys if key in item})
+                    index_key = tuple(item_fields.get(key) for key in self.index_keys)
+                    if index_key not in self._latest or serial > self._latest[index_key][0]:
+                        self._latest[index_key] = (serial, item['id'])
+
+    @classmethod
+    def load(cls, source):
+        """
+        Load the streams document from a URL, a local file or the root
+        directory of a local mirror of the released images.
+        """
+        if source.startswith(('http://', 'https://')):
+            # Imported here as reports from a local mirror do not need it
+            import requests
+            response = requests.get(source)
+            response.raise_for_status()
+            content = response.text
+        else:
+            if source.startswith('file://'):
+                source = source[len('file://'):]
+            if os.path.isdir(source):
+                source = _mirror_streams_path(source)
+            with open(source, encoding='utf-8') as streams_file:
+                content = streams_file.read()
+        return cls(json.loads(_strip_pgp_signature(content)))
+
+    def get_image(self, region, suite, arch, virt='hvm', root_store='ssd'):
+        """
+        Return the latest AMI ID for the given image or None if streams has no
+        such image.
+        """
+        latest = self._latest.get((region, suite, arch, virt, root_store))
+        return latest[1] if latest else None
+
+
+def _mirror_streams_path(mirror_dir):
+    for streams_path in STREAMS_MIRROR_PATHS:
+        streams_path = os.path.join(mirror_dir, streams_path)
+        if os.path.exists(streams_path):
+            return streams_path
+    raise FileNotFoundError(
+        'No streams document in the mirror {}, expected {}'.format(
+            mirror_dir, ' or '.join(STREAMS_MIRROR_PATHS)
+        )
+    )
+
+
+def _strip_pgp_signature(content):
+    # Signed (.sjson) streams documents wrap the JSON in a clearsigned message
+    if not content.startswith('-----BEGIN PGP SIGNED MESSAGE-----'):
+        return content
+    signed_content = content.split('\n\n', 1)[1]
+    return signed_content.split('-----BEGIN PGP SIGNATURE-----', 1)[0]
@@ -0,0 +1,150 @@
+"""
+Per-phase timings of a scrape and peak memory use.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+import click
+
+try:
+    import resource
+except ImportError:
+    # Only used to report peak memory use, which is skipped without it
+    resource = None
+
+
+class Timings:
+    """
+    Thread safe recorder of how long each phase of a scrape takes.
+
+    Spans are labelled with the command and with whatever else identifies
+    them, such as the region. They are written out as a JSON report and as
+    a Prometheus textfile collector file.
+    """
+
+    # Labels kept in the Prometheus metrics, others are only in the JSON report
+    prometheus_labels = ("phase", "region")
+
+    def __init__(self, command):
+        self.command = command
+        self.started_at = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, phase, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start, **labels)
+
+    def record(self, phase, duration, **labels):
+        with self._lock:
+            self.spans.append(dict(labels, phase=phase, duration=duration))
+
+    def report(self):
+        with self._lock:
+            spans = list(self.spans)
+        phases = {}
+        for span in spans:
+            phase = phases.setdefault(span["phase"], {"count": 0, "total": 0.0, "max": 0.0})
+            phase["count"] = phase["count"] + 1
+            phase["total"] = phase["total"] + span["duration"]
+            phase["max"] = max(phase["max"], span["duration"])
+        return {
+            "command": self.command,
+            "started_at": self.started_at,
+            "duration": time.time() - self.started_at,
+            "phases": phases,
+            "spans": spans,
+        }
+
+    def prometheus(self):
+        report = self.report()
+        metric = "aws_marketplace_ubuntu_scraper_phase_duration_seconds"
+        series = {}
+        for span in report["spans"]:
+            labels = (("command", self.command),) + tuple(
+                (label, span[label]) for label in self.prometheus_labels if span.get(label) is not None
+            )
+            duration_sum, count = series.get(labels, (0.0, 0))
+            series[labels] = (duration_sum + span["duration"], count + 1)
+        lines = [
+            "# HELP {} Time spent in each phase of a scrape.".format(metric),
+            "# TYPE {} summary".format(metric),
+        ]
+        for labels, (duration_sum, count) in sorted(series.items()):
+            label_text = ",".join('{}="{}"'.format(label, value) for label, value in labels)
+            lines.append("{}_sum{{{}}} {}".format(metric, label_text, duration_sum))
+            lines.append("{}_count{{{}}} {}".format(metric, label_text, count))
+        for name, help_text, value in (
+            ("run_duration_seconds", "Duration of the last run.", report["duration"]),
+            ("last_run_timestamp_seconds", "Time the last run started.", report["started_at"]),
+        ):
+            name = "aws_marketplace_ubuntu_scraper_{}".format(name)
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} gauge".format(name))
+            lines.append('{}{{command="{}"}} {}'.format(name, self.command, value))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Write the JSON report to ``path`` and the Prometheus metrics next to it
+        with a .prom extension.
+        """
+        prometheus_path = metrics_prometheus_path(path)
+        if prometheus_path == path:
+            raise ValueError("The JSON report {} would be overwritten by the Prometheus metrics".format(path))
+        with open(path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=4)
+        # The textfile collector may read at any time so replace the file
+        # in one go rather than writing it in place.
+        with open(prometheus_path + ".tmp", "w") as prometheus_file:
+            prometheus_file.write(self.prometheus())
+        os.replace(prometheus_path + ".tmp", prometheus_path)
+
+
+def metrics_prometheus_path(path):
+    return "{}.prom".format(os.path.splitext(path)[0])
+
+
+def check_metrics_out(ctx, param, value):
+    """
+    Reject a --metrics-out path the Prometheus metrics would be written over.
+    """
+    if value and metrics_prometheus_path(value) == value:
+        raise click.BadParameter(
+            "the Prometheus metrics are written next to the JSON file with a .prom "
+            "extension, so use another extension such as .json."
+        )
+    return value
+
+
+def timed(timings, phase, **labels):
+    """
+    Return a context manager timing ``phase`` in ``timings``, or doing nothing
+    if ``timings`` is None.
+    """
+    if timings is None:
+        return contextlib.nullcontext()
+    return timings.span(phase, **labels)
+
+
+def peak_rss():
+    """
+    Return a tuple of the peak resident set size in MB of this process and of
+    the largest of its finished child processes, or None if it is not known.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return tuple(
+        resource.getrusage(who).ru_maxrss / scale
+        for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+    )
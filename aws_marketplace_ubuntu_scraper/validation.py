@@ -0,0 +1,221 @@
+"""
+Rules checking the scraped quickstart listings and the
+``quicklaunch-validate`` command.
+"""
+import json
+import sys
+
+import click
+
+
+class QuickstartIndex:
+    """
+    Indexes of one region's Canonical quickstart listings, built once and
+    shared by all the validation rules.
+    """
+
+    def __init__(self, region, entries):
+        self.region = region
+        self.entries = entries
+        # Positions in ``entries`` of the Canonical listings
+        self.canonical = []
+        self.by_ami_id = {}
+        self.by_release_arch = {}
+        self.by_slot = {}
+        for position, entry in enumerate(entries):
+            if entry.get("owner", "") != "Canonical":
+                continue
+            self.canonical.append(position)
+            self.by_ami_id.setdefault(entry.get("ami_id", ""), []).append(position)
+            self.by_release_arch.setdefault(
+                (entry.get("release_version", ""), entry.get("arch", "")), []
+            ).append(position)
+            self.by_slot.setdefault(int(entry.get("quickstart_slot", "")), []).append(position)
+
+    def issue(self, rule, message, position=None, **fields):
+        """
+        Return a (position, issue record) tuple. Issues about a listing carry
+        its position so they can be reported in listing order.
+        """
+        issue = {"region": self.region, "rule": rule, "message": message}
+        if position is not None:
+            entry = self.entries[position]
+            for key in ("title", "listing_arch", "ami_id", "release_version", "arch", "quickstart_slot"):
+                issue[key] = entry.get(key, "")
+        issue.update(fields)
+        return (position if position is not None else len(self.entries), issue)
+
+
+def check_arch_mismatch(index, config):
+    for position in index.canonical:
+        entry = index.entries[position]
+        if entry.get("arch", "") != entry.get("listing_arch", ""):
+            yield index.issue(
+                "arch_mismatch",
+                "'{}' listing arch {} and AMI ({}) arch {} are not equal ".format(
+                    entry.get("title", ""),
+                    entry.get("listing_arch", ""),
+                    entry.get("ami_id", ""),
+                    entry.get("arch", ""),
+                ),
+                position,
+            )
+
+
+def check_max_slot(index, config):
+    max_slot = config["max_slot"]
+    for slot in sorted(index.by_slot):
+        if slot <= max_slot:
+            continue
+        for position in index.by_slot[slot]:
+            entry = index.entries[position]
+            yield index.issue(
+                "max_slot",
+                "'{}' {} listing slot is greater than {} - slot {}".format(
+                    entry.get("title", ""),
+                    entry.get("listing_arch", ""),
+                    max_slot,
+                    entry.get("quickstart_slot", ""),
+                ),
+                position,
+            )
+
+
+def check_duplicates(index, config):
+    for positions in index.by_ami_id.values():
+        # The first listing of an AMI is fine, every other one is a duplicate
+        for position in positions[1:]:
+            entry = index.entries[position]
+            yield index.issue(
+                "duplicate",
+                "'{}' {} listing AMI {} appears more than once  ".format(
+                    entry.get("title", ""),
+                    entry.get("listing_arch", ""),
+                    entry.get("ami_id", ""),
+                ),
+                position,
+            )
+
+
+def check_expected_listings(index, config):
+    for release_version, arches in config["expected_listings"].items():
+        for arch in arches:
+            if (release_version, arch) not in index.by_release_arch:
+                yield index.issue(
+                    "missing_listing",
+                    "There are no listings for {} {}  ".format(
+                        release_version, arch,
+                    ),
+                    release_version=release_version,
+                    arch=arch,
+                )
+
+
+QUICKSTART_RULES = {
+    "arch_mismatch": check_arch_mismatch,
+    "max_slot": check_max_slot,
+    "duplicate": check_duplicates,
+    "missing_listing": check_expected_listings,
+}
+DEFAULT_VALIDATION_CONFIG = {
+    "expected_listings": {
+        "16.04": ["amd64", "arm64"],
+        "18.04": ["amd64", "arm64"],
+        "20.04": ["amd64", "arm64"],
+    },
+    "max_slot": 10,
+    "rules": list(QUICKSTART_RULES),
+}
+
+
+def load_validation_config(config_file=None):
+    """
+    Return the validation config with any settings in the JSON
+    ``config_file`` overriding the defaults.
+    """
+    config = dict(DEFAULT_VALIDATION_CONFIG)
+    if config_file:
+        config.update(json.load(config_file))
+    unknown_rules = set(config["rules"]) - set(QUICKSTART_RULES)
+    if unknown_rules:
+        raise click.BadParameter(
+            "Unknown validation rules {}".format(", ".join(sorted(unknown_rules)))
+        )
+    return config
+
+
+def validate_quickstart_entries(quickstart_entries, config=DEFAULT_VALIDATION_CONFIG):
+    """
+    Run the configured rules over the (region, listings) tuples of a scrape.
+
+    Returns a list of issue records ordered by region and then by listing.
+    """
+    issues = []
+    for region, ubuntu_quickstart_entries in quickstart_entries:
+        index = QuickstartIndex(region, ubuntu_quickstart_entries)
+        region_issues = []
+        for rule in config["rules"]:
+            region_issues.extend(QUICKSTART_RULES[rule](index, config))
+        issues.extend(issue for position, issue in sorted(region_issues, key=lambda tup: tup[0]))
+    return issues
+
+
+def print_quickstart_entries(quickstart_entries):
+    for region, ubuntu_quickstart_entries in quickstart_entries:
+        print(region)
+        for ubuntu_quickstart_entry in ubuntu_quickstart_entries:
+            print(
+                "{} {}\n\t{} {} {} {} {} \n\t\t(Slot: {} , Description: {})".format(
+                    ubuntu_quickstart_entry.get("title", ""),
+                    ubuntu_quickstart_entry.get("listing_arch", ""),
+                    ubuntu_quickstart_entry.get("release_version", ""),
+                    ubuntu_quickstart_entry.get("serial", ""),
+                    ubuntu_quickstart_entry.get("arch", ""),
+                    ubuntu_quickstart_entry.get("ami_id", ""),
+                    ubuntu_quickstart_entry.get("owner", ""),
+                    ubuntu_quickstart_entry.get("quickstart_slot", ""),
+                    ubuntu_quickstart_entry.get("description", ""),
+                )
+            )
+        print()
+
+
+def print_issues(issues):
+    issues_by_region = {}
+    for issue in issues:
+        issues_by_region.setdefault(issue["region"], []).append(issue)
+    for region, region_issues in issues_by_region.items():
+        print(region)
+        for region_issue in region_issues:
+            print("\t* {}".format(region_issue["message"]))
+        print()
+
+
+@click.command(name="quicklaunch-validate")
+@click.option(
+    "--scraper-data",
+    type=click.File("r"),
+    required=True,
+    show_default=True,
+    default="quickstart_entries.json",
+)
+@click.option(
+    "--validation-config",
+    type=click.File("r"),
+    help="JSON file overriding the expected_listings, max_slot or rules to check.",
+)
+@click.option("--json-output/--no-json-output", default=False, help="Print the issues as JSON.")
+def quicklaunch_validate(scraper_data, validation_config, json_output):
+    """
+    Check saved quickstart entries for issues without scraping again.
+
+    Returns 0 if there are no issues and 2 if there are.
+    """
+    config = load_validation_config(validation_config)
+    issues = validate_quickstart_entries(json.load(scraper_data), config)
+    if json_output:
+        click.echo(json.dumps(issues, indent=4))
+    else:
+        print_issues(issues)
+    if issues:
+        sys.exit(2)
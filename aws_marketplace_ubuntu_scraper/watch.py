@@ -0,0 +1,240 @@
+"""
+The ``quicklaunch-watch`` command, polling the quickstart listings with
+signed in browser sessions kept open between polls and emitting only what
+changed.
+"""
+import contextlib
+import hashlib
+import json
+import random
+import sys
+import time
+
+import click
+import requests
+
+from aws_marketplace_ubuntu_scraper.ami import RecordedEc2Client
+from aws_marketplace_ubuntu_scraper.browser import BrowserSessionPool, browser_session_count, get_regions
+from aws_marketplace_ubuntu_scraper.quicklaunch import (
+    ami_metadata_option,
+    check_iam_options,
+    ec2_client,
+    iam_options,
+    load_quickstart_payloads,
+    saved_quickstart_regions,
+    scrape_options,
+    scrape_quicklaunch,
+)
+from aws_marketplace_ubuntu_scraper.regions import discover_regions, region_options
+
+WATCH_INTERVAL = 15 * 60
+# Fraction of the interval each poll is moved earlier or later by at random
+WATCH_JITTER = 0.1
+WEBHOOK_TIMEOUT = 30
+# The fields of a listing compared between polls
+WATCHED_FIELDS = ("quickstart_slot", "ami_id", "owner", "release_version", "listing_arch", "serial", "title")
+
+
+def listings_hash(listings):
+    """
+    Return a hash of the watched fields of a region's listings.
+    """
+    watched = [{field: listing.get(field) for field in WATCHED_FIELDS} for listing in listings]
+    return hashlib.sha256(json.dumps(watched, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _listings_by_release_arch(listings):
+    # The first, highest placed, listing of each release and arch
+    by_release_arch = {}
+    for listing in sorted(listings, key=lambda listing: listing.get("quickstart_slot", 0)):
+        key = (listing.get("owner"), listing.get("release_version"), listing.get("listing_arch"))
+        by_release_arch.setdefault(key, listing)
+    return by_release_arch
+
+
+def quickstart_changes(region, previous_listings, listings):
+    """
+    Return a dict describing each change between a region's previous and
+    current listings: a release and arch whose slot moved, whose AMI changed,
+    or which was added to or removed from the listings.
+    """
+    previous = _listings_by_release_arch(previous_listings)
+    current = _listings_by_release_arch(listings)
+    changes = []
+    for key in sorted(set(previous) | set(current), key=lambda key: tuple(str(part) for part in key)):
+        owner, release_version, listing_arch = key
+        change = {
+            "region": region,
+            "owner": owner,
+            "release_version": release_version,
+            "listing_arch": listing_arch,
+        }
+        if key not in previous:
+            changes.append(
+                dict(
+                    change,
+                    change="listing_added",
+                    quickstart_slot=current[key].get("quickstart_slot"),
+                    ami_id=current[key].get("ami_id"),
+                )
+            )
+        elif key not in current:
+            changes.append(
+                dict(
+                    change,
+                    change="listing_removed",
+                    previous_quickstart_slot=previous[key].get("quickstart_slot"),
+                    previous_ami_id=previous[key].get("ami_id"),
+                )
+            )
+        else:
+            for field, change_name in (("quickstart_slot", "slot_moved"), ("ami_id", "ami_changed")):
+                if previous[key].get(field) != current[key].get(field):
+                    changes.append(
+                        dict(
+                            change,
+                            change=change_name,
+                            **{
+                                "previous_{}".format(field): previous[key].get(field),
+                                field: current[key].get(field),
+                            }
+                        )
+                    )
+    return changes
+
+
+def emit_changes(changes, webhook=None, output=None):
+    """
+    Print each change as a JSON line to ``output``, by default stdout, and
+    POST them all to ``webhook``.
+    """
+    for change in changes:
+        click.echo(json.dumps(change, sort_keys=True), file=output)
+    if webhook and changes:
+        try:
+            response = requests.post(webhook, json={"changes": changes}, timeout=WEBHOOK_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            print("Failed to send {} changes to the webhook: {}".format(len(changes), error), file=sys.stderr)
+
+
+def next_poll_delay(interval, jitter):
+    return interval * (1 + random.uniform(-jitter, jitter))
+
+
+@click.command(name="quicklaunch-watch")
+@iam_options
+@scrape_options
+@region_options
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0),
+    default=WATCH_INTERVAL,
+    show_default=True,
+    help="Seconds between the start of each poll.",
+)
+@click.option(
+    "--jitter",
+    type=click.FloatRange(min=0, max=1),
+    default=WATCH_JITTER,
+    show_default=True,
+    help="Fraction of the interval each poll is moved earlier or later by at random.",
+)
+@click.option(
+    "--polls",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Stop after this many polls. By default polls until interrupted.",
+)
+@click.option("--webhook", help="URL to POST each poll's changes to as JSON.")
+@click.option(
+    "--payload-dir",
+    type=click.Path(exists=True, file_okay=False),
+    help="Poll the {region}-getQuickstartList.json files saved in this "
+    "directory instead of capturing the quickstart lists with a browser.",
+)
+@ami_metadata_option
+def quicklaunch_watch(
+    iam_account_id,
+    iam_username,
+    iam_password,
+    headless,
+    browser_sessions,
+    browser_memory,
+    block_assets,
+    direct_http,
+    ami_cache,
+    ami_cache_path,
+    capture_timeout,
+    capture_poll_interval,
+    only_regions,
+    region_cache_ttl,
+    interval,
+    jitter,
+    polls,
+    webhook,
+    payload_dir,
+    ami_metadata,
+):
+    """
+    Poll the quickstart listings of every region, keeping the browser
+    sessions signed in between polls, and print a JSON line for each change
+    to a region's listings. Progress is written to stderr.
+    """
+    if payload_dir:
+        browser_pool_context = contextlib.nullcontext()
+    else:
+        check_iam_options(iam_account_id, iam_username, iam_password)
+        browser_pool_context = BrowserSessionPool(
+            browser_sessions or browser_session_count(browser_memory),
+            iam_account_id,
+            iam_username,
+            iam_password,
+            headless,
+            block_assets=block_assets,
+        )
+    region_client_factory = RecordedEc2Client.factory(ami_metadata) if ami_metadata else ec2_client
+
+    # Region ID to the hash and listings of its last successful poll
+    snapshots = {}
+    poll = 0
+    changes_output = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr), browser_pool_context as browser_pool:
+        if payload_dir:
+            region_dict_list = [
+                {"id": region} for region in (only_regions or saved_quickstart_regions(payload_dir))
+            ]
+        else:
+            region_dict_list = discover_regions(
+                only_regions,
+                ec2_client,
+                lambda: get_regions(browser_pool, ()),
+                cache_ttl=region_cache_ttl,
+            )
+        while True:
+            poll_started = time.time()
+            poll += 1
+            changes = []
+            for region, listings, capture_time, error in scrape_quicklaunch(
+                browser_pool,
+                region_dict_list,
+                ami_cache,
+                ami_cache_path,
+                capture_timeout,
+                capture_poll_interval,
+                direct_http,
+                load_quickstart_payloads(payload_dir, region_dict_list) if payload_dir else None,
+                region_client_factory,
+            ):
+                if error:
+                    print("{} - Poll {} failed: {}".format(region, poll, error))
+                    continue
+                region_hash = listings_hash(listings)
+                if region in snapshots and snapshots[region][0] != region_hash:
+                    changes.extend(quickstart_changes(region, snapshots[region][1], listings))
+                snapshots[region] = (region_hash, listings)
+            print("Poll {} found {} changes".format(poll, len(changes)))
+            emit_changes(changes, webhook, changes_output)
+            if polls and poll >= polls:
+                break
+            time.sleep(max(0, poll_started + next_poll_delay(interval, jitter) - time.time()))
@@ -0,0 +1,77 @@
+"""
+Time classifying the synthetic AMI name corpus in
+benchmarks/fixtures/ami_names.txt by matching the owner's pattern string on
+every call, as get_ami_details used to, against the precompiled and memoized
+AMI_NAMES parser.
+
+Every pass re-analyses the whole corpus, as re-processing historical
+records does.
+
+    $ python -m benchmarks.bench_ami_names --passes 10
+"""
+import os
+import re
+import time
+
+import click
+
+from aws_marketplace_ubuntu_scraper import names
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ami_names.txt")
+
+
+def load_corpus(path=CORPUS_PATH):
+    corpus = []
+    with open(path) as corpus_file:
+        for line in corpus_file:
+            if line.startswith("#") or not line.strip():
+                continue
+            owner, name = line.rstrip("\n").split("\t", 1)
+            corpus.append((owner, name))
+    return corpus
+
+
+def _pattern_strings(owner):
+    return [pattern.pattern for pattern in names.AMI_NAMES._patterns[owner]]
+
+
+def _per_call(corpus):
+    pattern_strings = {owner: _pattern_strings(owner) for owner, name in corpus}
+    for owner, name in corpus:
+        for pattern_string in pattern_strings[owner]:
+            if re.match(pattern_string, name):
+                break
+
+
+def _uncached(corpus):
+    for owner, name in corpus:
+        names.AMI_NAMES._parse_uncached(name, owner)
+
+
+def _memoized(corpus):
+    for owner, name in corpus:
+        names.AMI_NAMES.parse(name, owner)
+
+
+@click.command()
+@click.option("--passes", default=10, show_default=True)
+def main(passes):
+    corpus = load_corpus()
+    matched = sum(1 for owner, name in corpus if names.AMI_NAMES.parse(name, owner))
+    click.echo("{} AMI names, {} matched".format(len(corpus), matched))
+    for label, strategy in (
+        ("pattern string per call", _per_call),
+        ("precompiled", _uncached),
+        ("precompiled and memoized", _memoized),
+    ):
+        start = time.perf_counter()
+        for corpus_pass in range(passes):
+            strategy(corpus)
+        elapsed = time.perf_counter() - start
+        click.echo(
+            "{:<26} {:>8.2f}us per name".format(label, elapsed / (passes * len(corpus)) * 1e6)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Compare the number of describe_images calls and the wall time per region of
+describing quickstart AMIs one at a time against the batched resolver.
+
+EC2 is replaced with a botocore Stubber and each call sleeps for
+``--latency`` seconds to stand in for the API round trip.
+
+    $ python -m benchmarks.bench_describe_images --regions 25 --listings 12
+"""
+import time
+
+import boto3
+import click
+
+from botocore.stub import Stubber
+
+from aws_marketplace_ubuntu_scraper import ami, names
+
+
+def _quickstart_list(listings):
+    ami_list = []
+    for listing in range(listings):
+        ami_list.append(
+            {
+                "platform": "ubuntu",
+                "title": "Ubuntu Server {}".format(listing),
+                "imageId64": "ami-{:08x}".format(listing * 2),
+                "imageIdArm64": "ami-{:08x}".format(listing * 2 + 1),
+            }
+        )
+    return {"amiList": ami_list}
+
+
+def _image(ami_id, arch):
+    return {
+        "ImageId": ami_id,
+        "OwnerId": names.CANONICAL_OWNER,
+        "Name": "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-{}-server-20201026".format(arch),
+    }
+
+
+def _stubbed_client(latency):
+    client = boto3.client(
+        "ec2",
+        region_name="us-east-1",
+        aws_access_key_id="benchmark",
+        aws_secret_access_key="benchmark",
+    )
+    client.meta.events.register(
+        "provide-client-params.ec2.DescribeImages", lambda **kwargs: time.sleep(latency)
+    )
+    return client
+
+
+def _per_ami(client, quickstart_list):
+    stubber = Stubber(client)
+    ami_ids = []
+    for listing in quickstart_list["amiList"]:
+        for image_id_key, listing_arch in ami.QUICKSTART_IMAGE_ID_KEYS:
+            ami_ids.append(listing[image_id_key])
+            stubber.add_response(
+                "describe_images", {"Images": [_image(listing[image_id_key], listing_arch)]}
+            )
+    with stubber:
+        for ami_id in ami_ids:
+            client.describe_images(Filters=[{"Name": "image-id", "Values": [ami_id]}])
+    return len(ami_ids)
+
+
+def _batched(client, quickstart_list):
+    images = [
+        _image(listing[image_id_key], listing_arch)
+        for listing in quickstart_list["amiList"]
+        for image_id_key, listing_arch in ami.QUICKSTART_IMAGE_ID_KEYS
+    ]
+    calls = 0
+    stubber = Stubber(client)
+    for batch_start in range(0, len(images), ami.DESCRIBE_IMAGES_BATCH_SIZE):
+        calls = calls + 1
+        stubber.add_response(
+            "describe_images",
+            {"Images": images[batch_start:batch_start + ami.DESCRIBE_IMAGES_BATCH_SIZE]},
+        )
+    with stubber:
+        ami.get_ubuntu_quickstart_listings("us-east-1", client, quickstart_list)
+        stubber.assert_no_pending_responses()
+    return calls
+
+
+@click.command()
+@click.option("--regions", default=25, show_default=True)
+@click.option("--listings", default=12, show_default=True, help="Ubuntu listings per region")
+@click.option("--latency", default=0.05, show_default=True, help="Seconds per API call")
+def main(regions, listings, latency):
+    quickstart_list = _quickstart_list(listings)
+    for label, strategy in (("per-AMI", _per_ami), ("batched", _batched)):
+        calls = 0
+        start = time.perf_counter()
+        for region in range(regions):
+            calls = calls + strategy(_stubbed_client(latency), quickstart_list)
+        elapsed = time.perf_counter() - start
+        click.echo(
+            "{:<8} {:>5} calls {:>6.1f} calls/region {:>8.3f}s/region".format(
+                label, calls, calls / regions, elapsed / regions
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare the time and memory taken to create the EC2 clients of every region
+with a boto3 session per region against the shared Ec2ClientFactory.
+
+    $ python -m benchmarks.bench_ec2_clients --regions 25 --iterations 5
+"""
+import statistics
+import time
+import tracemalloc
+
+import boto3
+import click
+
+from aws_marketplace_ubuntu_scraper import quicklaunch, regions
+
+
+def session_per_region(region_identifiers):
+    return [boto3.Session(region_name=region).client("ec2") for region in region_identifiers]
+
+
+def shared_factory(region_identifiers):
+    ec2_client_factory = quicklaunch.Ec2ClientFactory()
+    return [ec2_client_factory(region) for region in region_identifiers]
+
+
+def _time(create_clients, region_identifiers):
+    start = time.perf_counter()
+    create_clients(region_identifiers)
+    return time.perf_counter() - start
+
+
+def _peak_allocated(create_clients, region_identifiers):
+    # Traced separately as tracing slows the clients' creation down
+    tracemalloc.start()
+    create_clients(region_identifiers)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+@click.command()
+@click.option(
+    "--regions",
+    "region_count",
+    type=click.IntRange(min=1, max=len(regions.REGION_NAMES)),
+    default=25,
+    show_default=True,
+)
+@click.option("--iterations", default=5, show_default=True)
+def main(region_count, iterations):
+    region_identifiers = sorted(regions.REGION_NAMES)[:region_count]
+    # Warm up the imports and the files the loaders read
+    shared_factory(region_identifiers[:1])
+    for name, create_clients in (("session per region", session_per_region), ("shared factory", shared_factory)):
+        duration = statistics.median(_time(create_clients, region_identifiers) for iteration in range(iterations))
+        click.echo(
+            "{:<20} {:>9.1f}ms {:>7.1f}MB peak allocated for {} regions".format(
+                name,
+                duration * 1000,
+                _peak_allocated(create_clients, region_identifiers) / 1024 / 1024,
+                region_count,
+            )
+        )
+
+if __name__ == "__main__":
+    main()
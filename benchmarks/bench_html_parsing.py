@@ -0,0 +1,70 @@
+"""
+Time parsing the saved seller profile and listing page fixtures with each
+HTML parser, building the full tree or only the parts of the pages we read.
+
+    $ python -m benchmarks.bench_html_parsing --iterations 50
+"""
+import os
+import time
+
+import click
+
+from aws_marketplace_ubuntu_scraper import marketplace
+
+FIXTURES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures", "marketplace"
+)
+STRAINERS = (
+    "MARKETPLACE_PAGINATION_STRAINER",
+    "MARKETPLACE_PRODUCTS_STRAINER",
+    "MARKETPLACE_LISTING_STRAINER",
+)
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as fixture:
+        return fixture.read()
+
+
+def _parse(page, listing):
+    marketplace.get_marketplace_page_links(page)
+    marketplace.parse_marketplace_page(page, "1")
+    marketplace.parse_marketplace_listing(listing)
+
+
+@click.command()
+@click.option("--iterations", default=50, show_default=True)
+def main(iterations):
+    page = _fixture("seller-profile-page-1.html")
+    listing = _fixture("listing.html")
+    strainers = {name: getattr(marketplace, name) for name in STRAINERS}
+    parsers = ["html.parser"]
+    try:
+        import lxml  # noqa: F401
+        parsers.append("lxml")
+    except ImportError:
+        click.echo("lxml is not installed, only timing html.parser")
+
+    baseline = None
+    for html_parser in parsers:
+        for strained in (False, True):
+            marketplace.HTML_PARSER = html_parser
+            for name, strainer in strainers.items():
+                setattr(marketplace, name, strainer if strained else None)
+            start = time.perf_counter()
+            for iteration in range(iterations):
+                _parse(page, listing)
+            elapsed = (time.perf_counter() - start) / iterations
+            baseline = baseline or elapsed
+            click.echo(
+                "{:<12} {:<10} {:>8.2f}ms per page and listing {:>6.1f}x".format(
+                    html_parser,
+                    "strained" if strained else "full tree",
+                    elapsed * 1000,
+                    baseline / elapsed,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Time how long each command takes to start, and list the heavy dependencies
+it imports, by running ``--help`` in a fresh interpreter.
+
+Interpreter startup is timed on its own and subtracted. With ``--check`` the
+run fails if a command imports a heavy dependency it does not need.
+
+    $ python -m benchmarks.bench_import_time --iterations 10 --check
+"""
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+
+HEAVY_MODULES = ("boto3", "botocore", "bs4", "joblib", "requests", "selenium", "seleniumwire")
+# The heavy modules each command is expected to import
+COMMAND_MODULES = {
+    None: (),
+    "quicklaunch-report": (),
+    "quicklaunch-validate": (),
+    "history-slots": (),
+    "history-serial-lag": (),
+    "marketplace": ("bs4", "requests"),
+    "quicklaunch": HEAVY_MODULES,
+    "quicklaunch-coordinator": HEAVY_MODULES,
+    "quicklaunch-worker": HEAVY_MODULES,
+    "quicklaunch-watch": HEAVY_MODULES,
+}
+IMPORTED_MODULES_SCRIPT = """
+import json, sys
+from aws_marketplace_ubuntu_scraper.cli import main
+command_name = {command_name!r}
+if command_name:
+    main.get_command(None, command_name)
+print(json.dumps(sorted(name for name in {heavy_modules!r} if name in sys.modules)))
+"""
+
+
+def _run(args):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def _imported_modules(command_name):
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            IMPORTED_MODULES_SCRIPT.format(command_name=command_name, heavy_modules=HEAVY_MODULES),
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout
+    return json.loads(output)
+
+
+@click.command()
+@click.option("--iterations", default=10, show_default=True)
+@click.option(
+    "--check/--no-check",
+    default=False,
+    help="Exit with an error if a command imports heavy modules it does not need.",
+)
+def main(iterations, check):
+    interpreter = statistics.median(_run(["-c", "pass"]) for iteration in range(iterations))
+    click.echo("{:<22} {:>9.1f}ms".format("interpreter", interpreter * 1000))
+
+    unexpected = {}
+    for command_name, expected_modules in COMMAND_MODULES.items():
+        args = ["-m", "aws_marketplace_ubuntu_scraper"] + ([command_name] if command_name else []) + ["--help"]
+        startup = statistics.median(_run(args) for iteration in range(iterations)) - interpreter
+        imported_modules = _imported_modules(command_name)
+        extra_modules = sorted(set(imported_modules) - set(expected_modules))
+        if extra_modules:
+            unexpected[command_name or "--help"] = extra_modules
+        click.echo(
+            "{:<22} {:>9.1f}ms {}".format(
+                command_name or "--help", startup * 1000, " ".join(imported_modules) or "-"
+            )
+        )
+
+    if check and unexpected:
+        for command_name, extra_modules in unexpected.items():
+            click.echo("{} imports {}".format(command_name, ", ".join(extra_modules)), err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
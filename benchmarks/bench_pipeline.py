@@ -0,0 +1,275 @@
+"""
+Time the quicklaunch, marketplace and quicklaunch-report pipelines end to end
+against recorded data, without a browser or network access.
+
+The recorded getQuickstartList payloads, seller profile and listing pages and
+simplestreams data are served by a local stand in HTTP server and EC2 is
+replaced with a botocore Stubber replaying recorded describe_images responses.
+
+Each stage is timed over ``--iterations`` runs and its median compared with
+the baselines in benchmarks/baselines.json. With ``--check`` the run fails if
+a stage is more than ``--tolerance`` times and ``--min-delta`` milliseconds
+slower than its baseline, the latter so stages taking well under a
+millisecond do not fail on noise.
+
+    $ python -m benchmarks.bench_pipeline --check
+    $ python -m benchmarks.bench_pipeline --save-baseline
+"""
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import boto3
+import click
+
+from botocore.stub import Stubber
+from click.testing import CliRunner
+
+from aws_marketplace_ubuntu_scraper import ami, fetch, marketplace, quicklaunch, quickstart_http, report, validation
+from tests.helpers import threaded_http_server
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+TESTS_FIXTURES_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "tests", "fixtures")
+DESCRIBE_IMAGES_DIR = os.path.join(TESTS_FIXTURES_DIR, "describe_images")
+BASELINES_PATH = os.path.join(BENCHMARKS_DIR, "baselines.json")
+REGIONS = ("eu-west-1", "us-east-1")
+
+
+def _read(*path):
+    with open(os.path.join(*path), "rb") as fixture:
+        return fixture.read()
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Serve the recorded console, marketplace and simplestreams responses."""
+
+    def _send(self, content, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        region = parse_qs(urlparse(self.path).query)["region"][0]
+        self._send(
+            _read(TESTS_FIXTURES_DIR, "{}-getQuickstartList.json".format(region)),
+            "application/json",
+        )
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/streams/released-aws.json":
+            self._send(_read(TESTS_FIXTURES_DIR, "streams", "released-aws.json"), "application/json")
+        elif url.path == "/marketplace/seller-profile":
+            page = parse_qs(url.query).get("page", ["1"])[0]
+            self._send(
+                _read(TESTS_FIXTURES_DIR, "marketplace", "seller-profile-page-{}.html".format(page)),
+                "text/html",
+            )
+        else:
+            self._send(_read(TESTS_FIXTURES_DIR, "marketplace", "listing.html"), "text/html")
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def stand_in_server():
+    """
+    Serve the recorded responses on localhost and point the marketplace
+    scraper at them.
+    """
+    marketplace_urls = (marketplace.MARKETPLACE_URL_BASE, marketplace.MARKETPLACE_PROFILE_URL_BASE)
+    with threaded_http_server(_StandInHandler) as base_url:
+        marketplace.MARKETPLACE_URL_BASE = base_url
+        marketplace.MARKETPLACE_PROFILE_URL_BASE = "{}/marketplace/seller-profile".format(base_url)
+        try:
+            yield base_url
+        finally:
+            marketplace.MARKETPLACE_URL_BASE, marketplace.MARKETPLACE_PROFILE_URL_BASE = marketplace_urls
+
+
+class _CapturedRequest:
+    """Stand in for the getQuickstartList request seleniumwire captures."""
+
+    def __init__(self, base_url):
+        self.method = "POST"
+        self.path = "{}/ec2/ecb?call=getQuickstartList&region=us-east-1".format(base_url)
+        self.headers = {"Content-Type": "application/json"}
+        self.body = b'{"region": "us-east-1"}'
+
+
+def _stubbed_client(region):
+    client = boto3.client(
+        "ec2",
+        region_name=region,
+        aws_access_key_id="benchmark",
+        aws_secret_access_key="benchmark",
+    )
+    stubber = Stubber(client)
+    stubber.add_response(
+        "describe_images", json.loads(_read(DESCRIBE_IMAGES_DIR, "{}.json".format(region)))
+    )
+    stubber.activate()
+    return client
+
+
+def _quicklaunch_fetch(base_url):
+    client = quickstart_http.QuickstartListClient.from_captured_request(_CapturedRequest(base_url), "us-east-1")
+    try:
+        return client.fetch_many(REGIONS)
+    finally:
+        client.close()
+
+
+def _quicklaunch_enrich(quickstart_lists):
+    # The stubbed clients are created up front so only the enrichment is timed
+    region_clients = {region: _stubbed_client(region) for region in quickstart_lists}
+    start = time.perf_counter()
+    quickstart_results = [
+        (
+            region,
+            ami.get_ubuntu_quickstart_listings(region, region_clients[region], region_quickstart_entries),
+            capture_time,
+            None,
+        )
+        for region, (capture_time, region_quickstart_entries) in quickstart_lists.items()
+    ]
+    return time.perf_counter() - start, quickstart_results
+
+
+def _marketplace(base_url):
+    with fetch.FetchEngine() as fetch_engine:
+        public_profile_url = "{}?id={}".format(
+            marketplace.MARKETPLACE_PROFILE_URL_BASE, marketplace.CANONICAL_MARKETPLACE_PROFILE
+        )
+        page_links = marketplace.get_marketplace_page_links(fetch_engine.fetch(public_profile_url, "page_request"))
+        return marketplace.scrape_marketplace(fetch_engine, page_links)
+
+
+def run_stages(base_url, work_dir):
+    """
+    Run every stage once and return a dict of stage name to seconds taken.
+    """
+    durations = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        quickstart_lists = _quicklaunch_fetch(base_url)
+        durations["quicklaunch.fetch"] = time.perf_counter() - start
+
+        durations["quicklaunch.enrich"], quickstart_results = _quicklaunch_enrich(quickstart_lists)
+        quickstart_entries = sorted(
+            [(region, listings) for region, listings, capture_time, error in quickstart_results],
+            key=lambda tup: tup[0],
+        )
+
+        start = time.perf_counter()
+        validation.validate_quickstart_entries(quickstart_entries)
+        durations["quicklaunch.validate"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        quicklaunch.report_quicklaunch(quickstart_results)
+        durations["quicklaunch.report"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _marketplace(base_url)
+        durations["marketplace"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = CliRunner().invoke(
+        report.quicklaunch_report,
+        [
+            "--scraper-data",
+            os.path.join(work_dir, "quickstart_entries.json"),
+            "--streams",
+            "{}/streams/released-aws.json".format(base_url),
+        ],
+    )
+    durations["quicklaunch-report"] = time.perf_counter() - start
+    if result.exit_code not in (0, 2):
+        raise RuntimeError("quicklaunch-report failed:\n{}".format(result.output))
+    return durations
+
+
+@click.command()
+@click.option("--iterations", default=20, show_default=True)
+@click.option(
+    "--check/--no-check",
+    default=False,
+    help="Exit with an error if a stage is slower than its baseline allows.",
+)
+@click.option(
+    "--tolerance",
+    type=click.FloatRange(min=1),
+    default=3.0,
+    show_default=True,
+    help="How many times slower than its baseline a stage may be.",
+)
+@click.option(
+    "--min-delta",
+    type=click.FloatRange(min=0),
+    default=5.0,
+    show_default=True,
+    help="Milliseconds slower than its baseline a stage may always be.",
+)
+@click.option(
+    "--save-baseline/--no-save-baseline",
+    default=False,
+    help="Store this run's timings as the baselines.",
+)
+@click.option("--baselines", "baselines_path", default=BASELINES_PATH, show_default=True)
+def main(iterations, check, tolerance, min_delta, save_baseline, baselines_path):
+    samples = {}
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir, stand_in_server() as base_url:
+        # report_quicklaunch writes quickstart_entries.json to the working directory
+        os.chdir(work_dir)
+        try:
+            for iteration in range(iterations):
+                for stage, duration in run_stages(base_url, work_dir).items():
+                    samples.setdefault(stage, []).append(duration)
+        finally:
+            os.chdir(working_directory)
+    medians = {stage: statistics.median(durations) for stage, durations in samples.items()}
+
+    baselines = {}
+    if os.path.exists(baselines_path):
+        with open(baselines_path) as baselines_file:
+            baselines = json.load(baselines_file)["stages"]
+
+    regressions = []
+    for stage, median in medians.items():
+        baseline = baselines.get(stage)
+        if baseline:
+            ratio = median / baseline
+            if ratio > tolerance and (median - baseline) * 1000 > min_delta:
+                regressions.append(stage)
+            comparison = "{:>6.2f}x baseline".format(ratio)
+        else:
+            comparison = "no baseline"
+        click.echo("{:<22} {:>9.2f}ms {}".format(stage, median * 1000, comparison))
+
+    if save_baseline:
+        with open(baselines_path, "w") as baselines_file:
+            json.dump({"iterations": iterations, "stages": medians}, baselines_file, indent=4, sort_keys=True)
+            baselines_file.write("\n")
+        click.echo("Saved baselines to {}".format(baselines_path))
+    if check and regressions:
+        click.echo(
+            "Slower than {}x the baseline: {}".format(tolerance, ", ".join(regressions)), err=True
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
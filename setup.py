@@ -2,9 +2,6 @@ import io
 import os
 import re
 
-from glob import glob
-from os.path import basename
-from os.path import splitext
 from setuptools import find_packages
 from setuptools import setup
 
@@ -32,8 +29,7 @@ setup(
     description="CLI to return the Ubuntu AMIs in AWS marketplace",
     long_description=read("README.md"),
     long_description_content_type="text/markdown",
-    packages=find_packages(exclude=('tests',)),
-    py_modules=[splitext(basename(path))[0] for path in glob('*.py')],
+    packages=find_packages(exclude=('tests', 'benchmarks')),
     install_requires=dependencies,
     setup_requires=['wheel'],
     classifiers=[
@@ -0,0 +1,15 @@
+import contextlib
+
+import pytest
+
+from helpers import threaded_http_server
+
+
+@pytest.fixture
+def http_server():
+    """
+    Return a function serving a handler class until the test ends and
+    returning its base URL.
+    """
+    with contextlib.ExitStack() as servers:
+        yield lambda handler_class: servers.enter_context(threaded_http_server(handler_class))
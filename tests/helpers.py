@@ -0,0 +1,23 @@
+"""
+Helpers shared by the tests and the benchmarks.
+"""
+import contextlib
+import threading
+
+from http.server import ThreadingHTTPServer
+
+
+@contextlib.contextmanager
+def threaded_http_server(handler_class):
+    """
+    Serve ``handler_class`` on a free localhost port from a thread and yield
+    the server's base URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield "http://127.0.0.1:{}".format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,53 @@
+from aws_marketplace_ubuntu_scraper import names
+
+
+def test_parse_canonical_name():
+    owner, attrs = names.AMI_NAMES.parse(
+        "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-arm64-server-20201026.1", names.CANONICAL_OWNER
+    )
+    assert owner == "Canonical"
+    assert attrs["virt_storage"] == "hvm-ssd"
+    assert attrs["suite"] == "focal"
+    assert attrs["release_version"] == "20.04"
+    assert attrs["arch"] == "arm64"
+    assert attrs["serial"] == "20201026.1"
+
+
+def test_parse_ubuntu_pro_name():
+    owner, attrs = names.AMI_NAMES.parse(
+        "trusty-ua-tools-20191128-d984c693-feaa-4be0-bc34-2099410bc9cc-ami-075ab031d5a3404c6.4",
+        names.AWS_UBUNTU_PRO_OWNER_ALIAS,
+    )
+    assert owner == "aws-marketplace"
+    assert attrs["serial"] == "20191128"
+    assert attrs["source_ami"] == "ami-075ab031d5a3404c6"
+
+
+def test_parse_without_owner_tries_every_owner():
+    owner, attrs = names.AMI_NAMES.parse("ubuntu-xenial-16.04-amd64-server-20190212-SQL_2017_Standard-2019.04.02")
+    assert owner == "amazon"
+    assert attrs["serial"] == "20190212"
+    assert names.AMI_NAMES.parse("Deep Learning AMI (Ubuntu 18.04) Version 36.0") is None
+
+
+def test_parse_returns_copies_of_memoized_attributes():
+    name = "ubuntu/images/hvm-ssd/ubuntu-bionic-18.04-amd64-server-20201014"
+    names.AMI_NAMES.parse(name, names.CANONICAL_OWNER)[1]["serial"] = "changed"
+    assert names.AMI_NAMES.parse(name, names.CANONICAL_OWNER)[1]["serial"] == "20201014"
+
+
+def test_parse_many_and_register():
+    parser = names.AmiNameParser()
+    parser.register("123456789012", r"custom-(?P<serial>\d+)", label="Custom")
+    assert parser.parse_many(["custom-1", "other", "custom-2"]) == [
+        ("Custom", {"serial": "1"}),
+        None,
+        ("Custom", {"serial": "2"}),
+    ]
+    parser.register("123456789012", r"other")
+    assert parser.parse("other") == ("Custom", {})
+
+
+def test_parse_ami_name_keeps_owner_when_name_does_not_match():
+    image = {"ImageId": "ami-0001", "OwnerId": names.CANONICAL_OWNER, "Name": "not-an-ubuntu-name"}
+    assert names.parse_ami_name(image) == ("Canonical", {})
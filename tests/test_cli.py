@@ -0,0 +1,32 @@
+import json
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from aws_marketplace_ubuntu_scraper import cli
+
+
+def test_help_lists_commands_without_importing_them():
+    result = CliRunner().invoke(cli.main, ["--help"])
+    assert result.exit_code == 0
+    # Long summaries are wrapped over several lines
+    output = " ".join(result.output.split())
+    for command_name, (module_name, function_name, short_help) in cli.COMMANDS.items():
+        assert "{} {}".format(command_name, short_help) in output
+
+
+def test_report_commands_do_not_import_scraping_dependencies():
+    script = (
+        "import json, sys\n"
+        "from aws_marketplace_ubuntu_scraper.cli import main\n"
+        "main.get_command(None, 'quicklaunch-report')\n"
+        "main.get_command(None, 'quicklaunch-validate')\n"
+        "print(json.dumps(sorted(sys.modules)))\n"
+    )
+    imported_modules = json.loads(
+        subprocess.run([sys.executable, "-c", script], check=True, stdout=subprocess.PIPE).stdout
+    )
+    for module_name in ("boto3", "bs4", "joblib", "requests", "selenium", "seleniumwire"):
+        assert module_name not in imported_modules
+    assert "aws_marketplace_ubuntu_scraper.report" in imported_modules
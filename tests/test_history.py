@@ -0,0 +1,115 @@
+from click.testing import CliRunner
+
+from aws_marketplace_ubuntu_scraper import history
+
+DAY = 24 * 60 * 60
+
+
+def _listing(quickstart_slot, release_version, listing_arch, serial, owner="Canonical"):
+    return {
+        "quickstart_slot": quickstart_slot,
+        "ami_id": "ami-{}-{}".format(listing_arch, serial),
+        "owner": owner,
+        "release_version": release_version,
+        "listing_arch": listing_arch,
+        "serial": serial,
+        "title": "Ubuntu Server {} LTS".format(release_version),
+    }
+
+
+def _history_store(path):
+    history_store = history.HistoryStore(path)
+    history_store.record_quicklaunch(
+        [
+            ("ap-south-1", [_listing(4, "20.04", "arm64", "20201026")], 1.0, None),
+            ("us-east-1", [_listing(2, "20.04", "arm64", "20201026")], 1.0, None),
+        ],
+        recorded_at=1 * DAY,
+    )
+    history_store.record_quicklaunch(
+        [("ap-south-1", [], None, "timed out")], recorded_at=2 * DAY
+    )
+    history_store.record_quicklaunch(
+        [
+            ("ap-south-1", [_listing(12, "20.04", "arm64", "20201026")], 1.0, None),
+            ("us-east-1", [_listing(2, "20.04", "arm64", "20201112.1")], 1.0, None),
+        ],
+        recorded_at=3 * DAY,
+    )
+    history_store.record_quicklaunch(
+        [("ap-south-1", [_listing(1, "18.04", "amd64", "20201112")], 1.0, None)],
+        recorded_at=4 * DAY,
+    )
+    return history_store
+
+
+def test_slot_history_skips_failed_regions(tmp_path):
+    history_store = _history_store(str(tmp_path / "history.sqlite"))
+    assert history_store.slot_history("ap-south-1", "20.04", "arm64") == [
+        (1 * DAY, 4, "ami-arm64-20201026", "20201026"),
+        (3 * DAY, 12, "ami-arm64-20201026", "20201026"),
+        (4 * DAY, None, None, None),
+    ]
+    assert history_store.slot_history("ap-south-1", "20.04", "arm64", since=3 * DAY)[0][1] == 12
+    assert history_store.slot_history("ap-south-1", "20.04", "arm64", owner="Amazon") == [
+        (1 * DAY, None, None, None),
+        (3 * DAY, None, None, None),
+        (4 * DAY, None, None, None),
+    ]
+
+
+def test_serial_lag(tmp_path):
+    history_store = _history_store(str(tmp_path / "history.sqlite"))
+    history_store.record_marketplace(
+        [
+            (
+                "1",
+                [
+                    {
+                        "product_order": 1,
+                        "page_order": "1",
+                        "release_version": "20.04",
+                        "serial": "20201201",
+                        "type": "Amazon Machine Image",
+                        "title": "Ubuntu 20.04 LTS - Focal",
+                    }
+                ],
+            )
+        ]
+    )
+    run_id = history_store.latest_run("quicklaunch")
+    assert history_store.serial_lag() == [
+        {
+            "region": "ap-south-1",
+            "quickstart_slot": 1,
+            "release_version": "18.04",
+            "listing_arch": "amd64",
+            "ami_id": "ami-amd64-20201112",
+            "serial": "20201112",
+            "newest_serial": "20201112",
+            "lag_days": 0,
+            "marketplace_serial": None,
+            "marketplace_lag_days": None,
+        }
+    ]
+    serial_lags = history_store.serial_lag(run_id - 1)
+    assert [(serial_lag["region"], serial_lag["lag_days"]) for serial_lag in serial_lags] == [
+        ("ap-south-1", 17),
+        ("us-east-1", 0),
+    ]
+    assert [serial_lag["marketplace_lag_days"] for serial_lag in serial_lags] == [36, 19]
+
+
+def test_history_slots_command(tmp_path):
+    history_db = str(tmp_path / "history.sqlite")
+    _history_store(history_db).close()
+    result = CliRunner().invoke(
+        history.history_slots,
+        ["--history-db", history_db, "--region", "ap-south-1", "--release", "20.04", "--arch", "arm64"],
+    )
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        "1970-01-02 00:00 slot 4   ami-arm64-20201026 20201026",
+        "1970-01-04 00:00 slot 12  ami-arm64-20201026 20201026",
+        "1970-01-05 00:00 not listed",
+    ]
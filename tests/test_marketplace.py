@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from aws_marketplace_ubuntu_scraper import cache, fetch, marketplace
+from aws_marketplace_ubuntu_scraper.timing import Timings
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "marketplace")
+PAGE_URL = "{}?id={}&page={{}}".format(
+    marketplace.MARKETPLACE_PROFILE_URL_BASE, marketplace.CANONICAL_MARKETPLACE_PROFILE
+)
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as fixture:
+        return fixture.read()
+
+
+class _FakeFetchEngine:
+    def __init__(self, pages):
+        self.pages = pages
+        self.fetched = []
+        self.phases = {}
+
+    def submit(self, url, phase="http_request"):
+        self.fetched.append(url)
+        self.phases[url] = phase
+        future = Future()
+        future.set_result(self.pages.get(url, _fixture("listing.html")))
+        return future
+
+
+def test_get_marketplace_page_links():
+    assert marketplace.get_marketplace_page_links(_fixture("seller-profile-page-1.html")) == {
+        PAGE_URL.format(1),
+        PAGE_URL.format(2),
+    }
+
+
+def test_scrape_marketplace_keeps_page_and_slot_order():
+    fetch_engine = _FakeFetchEngine(
+        {
+            PAGE_URL.format(1): _fixture("seller-profile-page-1.html"),
+            PAGE_URL.format(2): _fixture("seller-profile-page-2.html"),
+        }
+    )
+    pages = marketplace.scrape_marketplace(fetch_engine, [PAGE_URL.format(2), PAGE_URL.format(1)])
+    assert [page for page, products in pages] == ["1", "2"]
+    products = [product for page, products in pages for product in products]
+    assert [product["product_order"] for product in products] == [1, 2, 3, 11, 12]
+    assert products[0] == {
+        "unique_identifier": "Ubuntu 20.04 LTS - Focal (Amazon Machine Image) - 20201026",
+        "version": "20.04 LTS - 20201026",
+        "release_version": "20.04",
+        "title": "Ubuntu 20.04 LTS - Focal",
+        "pricing": "Free",
+        "info": "Linux/Unix, Ubuntu 20.04 - 64-bit Amazon Machine Image (AMI)",
+        "description": "Ubuntu 20.04 LTS Focal Fossa server image.\nUbuntu is the most popular Linux distribution in the cloud.",
+        "product_in_page_order": 1,
+        "page_order": "1",
+        "product_order": 1,
+        "serial": "20201026",
+        "marketplace_url": "https://aws.amazon.com/marketplace/pp/B087QQNGF1?qid=1603721451&sr=0-1",
+        "type": "Amazon Machine Image",
+    }
+    assert len(fetch_engine.fetched) == 7
+    assert sorted(fetch_engine.phases.values()) == ["listing_request"] * 5 + ["page_request"] * 2
+
+
+def test_scrape_marketplace_incremental_only_fetches_changed_listings(tmp_path):
+    pages = {
+        PAGE_URL.format(1): _fixture("seller-profile-page-1.html"),
+        PAGE_URL.format(2): _fixture("seller-profile-page-2.html"),
+    }
+    previous_pages = marketplace.scrape_marketplace(_FakeFetchEngine(pages), list(pages))
+    # The first product has changed since the previous run
+    previous_pages[0][1][0]["version"] = "20.04 LTS - 20201012"
+    state_path = str(tmp_path / "marketplace_products.json")
+    marketplace.write_marketplace_state(state_path, previous_pages)
+
+    fetch_engine = _FakeFetchEngine(pages)
+    incremental_pages = marketplace.scrape_marketplace(
+        fetch_engine, list(pages), previous_types=marketplace.load_marketplace_state(state_path)
+    )
+    assert sorted(fetch_engine.fetched) == sorted(
+        list(pages) + [incremental_pages[0][1][0]["marketplace_url"]]
+    )
+    assert incremental_pages == marketplace.scrape_marketplace(_FakeFetchEngine(pages), list(pages))
+
+    # The listing page of the second product failed to fetch so it has no type
+    incremental_pages[0][1][1]["type"] = ""
+    marketplace.write_marketplace_state(state_path, incremental_pages)
+    fetch_engine = _FakeFetchEngine(pages)
+    marketplace.scrape_marketplace(
+        fetch_engine, list(pages), previous_types=marketplace.load_marketplace_state(state_path)
+    )
+    assert sorted(fetch_engine.fetched) == sorted(
+        list(pages) + [incremental_pages[0][1][1]["marketplace_url"]]
+    )
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            _SlowHandler.in_flight = _SlowHandler.in_flight + 1
+            _SlowHandler.max_in_flight = max(_SlowHandler.max_in_flight, _SlowHandler.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            _SlowHandler.in_flight = _SlowHandler.in_flight - 1
+        content = self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url(http_server):
+    # The counts are kept on the class so would otherwise carry over between tests
+    _SlowHandler.in_flight = 0
+    _SlowHandler.max_in_flight = 0
+    return http_server(_SlowHandler)
+
+
+def test_fetch_engine_limits_requests_per_host(server_url):
+    timings = Timings("marketplace")
+    with fetch.FetchEngine(max_workers=8, max_per_host=2, timings=timings) as fetch_engine:
+        futures = [
+            fetch_engine.submit(
+                "{}/{}".format(server_url, page), "page_request" if page < 2 else "listing_request"
+            )
+            for page in range(8)
+        ]
+        assert [future.result() for future in futures] == [
+            "/{}".format(page).encode() for page in range(8)
+        ]
+    assert _SlowHandler.max_in_flight == 2
+    phases = timings.report()["phases"]
+    assert (phases["page_request"]["count"], phases["listing_request"]["count"]) == (2, 6)
+
+
+class _ConditionalHandler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        content = "{} {}".format(self.path, self.etag).encode()
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def conditional_server_url(http_server):
+    return http_server(_ConditionalHandler)
+
+
+def test_fetch_engine_revalidates_cached_pages(conditional_server_url, tmp_path):
+    _ConditionalHandler.etag = '"v1"'
+    page_cache = cache.HttpCache(str(tmp_path / "http-cache.sqlite"))
+    url = "{}/page".format(conditional_server_url)
+    with fetch.FetchEngine(cache=page_cache) as fetch_engine:
+        assert fetch_engine.fetch(url) == b'/page "v1"'
+        assert fetch_engine.fetch(url) == b'/page "v1"'
+        _ConditionalHandler.etag = '"v2"'
+        assert fetch_engine.fetch(url) == b'/page "v2"'
+    assert (page_cache.hits, page_cache.revalidated, page_cache.misses) == (0, 1, 2)
+    page_cache.close()
+
+
+def test_fetch_engine_uses_fresh_cached_pages(conditional_server_url, tmp_path):
+    page_cache = cache.HttpCache(str(tmp_path / "http-cache.sqlite"), ttl=60)
+    url = "{}/fresh".format(conditional_server_url)
+    with fetch.FetchEngine(cache=page_cache) as fetch_engine:
+        first = fetch_engine.fetch(url)
+        assert fetch_engine.fetch(url) == first
+    assert (page_cache.hits, page_cache.misses) == (1, 1)
+    page_cache.close()
+
+
+def test_http_cache_evicts_least_recently_used(tmp_path):
+    page_cache = cache.HttpCache(str(tmp_path / "http-cache.sqlite"), max_size=10)
+    page_cache.put("https://example.com/old", b"123456", None, None)
+    time.sleep(0.01)
+    page_cache.put("https://example.com/new", b"123456", None, None)
+    page_cache.evict()
+    assert page_cache.get("https://example.com/old") is None
+    assert page_cache.get("https://example.com/new")[0] == b"123456"
+    page_cache.close()
+
+
+@pytest.mark.parametrize("html_parser", ["html.parser", "lxml"])
+def test_strained_parsing_matches_full_tree(monkeypatch, html_parser):
+    if html_parser == "lxml":
+        pytest.importorskip("lxml")
+    page = _fixture("seller-profile-page-1.html")
+    listing = _fixture("listing.html")
+    monkeypatch.setattr(marketplace, "HTML_PARSER", html_parser)
+    strained = (
+        marketplace.get_marketplace_page_links(page),
+        marketplace.parse_marketplace_page(page, "1"),
+        marketplace.parse_marketplace_listing(listing),
+    )
+    monkeypatch.setattr(marketplace, "HTML_PARSER", "html.parser")
+    monkeypatch.setattr(marketplace, "MARKETPLACE_PAGINATION_STRAINER", None)
+    monkeypatch.setattr(marketplace, "MARKETPLACE_PRODUCTS_STRAINER", None)
+    monkeypatch.setattr(marketplace, "MARKETPLACE_LISTING_STRAINER", None)
+    full_tree = (
+        marketplace.get_marketplace_page_links(page),
+        marketplace.parse_marketplace_page(page, "1"),
+        marketplace.parse_marketplace_listing(listing),
+    )
+    assert strained == full_tree
@@ -0,0 +1,430 @@
+import json
+import os
+import re
+import shutil
+
+import boto3
+import botocore.exceptions
+import pytest
+
+from botocore.stub import Stubber
+from click.testing import CliRunner
+
+from aws_marketplace_ubuntu_scraper import ami, browser, cache, checkpoint, names, quicklaunch
+
+
+def _ec2_client():
+    return boto3.client(
+        "ec2",
+        region_name="us-east-1",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+    )
+
+
+def _canonical_image(ami_id, name):
+    return {"ImageId": ami_id, "OwnerId": names.CANONICAL_OWNER, "Name": name}
+
+
+def test_describe_images_batched_single_call():
+    client = _ec2_client()
+    images = [
+        _canonical_image("ami-0001", "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-amd64-server-20201026"),
+        _canonical_image("ami-0002", "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-arm64-server-20201026"),
+    ]
+    with Stubber(client) as stubber:
+        stubber.add_response(
+            "describe_images", {"Images": images}, {"ImageIds": ["ami-0001", "ami-0002"]}
+        )
+        result = ami.describe_images_batched(client, ["ami-0001", "ami-0002", "ami-0001"])
+        stubber.assert_no_pending_responses()
+    assert sorted(result) == ["ami-0001", "ami-0002"]
+
+
+def test_describe_images_batched_chunks():
+    client = _ec2_client()
+    with Stubber(client) as stubber:
+        stubber.add_response("describe_images", {"Images": []}, {"ImageIds": ["ami-0001", "ami-0002"]})
+        stubber.add_response("describe_images", {"Images": []}, {"ImageIds": ["ami-0003"]})
+        ami.describe_images_batched(client, ["ami-0001", "ami-0002", "ami-0003"], batch_size=2)
+        stubber.assert_no_pending_responses()
+
+
+def test_describe_images_batched_skips_missing_amis():
+    client = _ec2_client()
+    image = _canonical_image("ami-0002", "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-amd64-server-20201026")
+    with Stubber(client) as stubber:
+        stubber.add_client_error(
+            "describe_images",
+            service_error_code="InvalidAMIID.NotFound",
+            service_message="The image id '[ami-0001]' does not exist",
+            expected_params={"ImageIds": ["ami-0001", "ami-0002"]},
+        )
+        stubber.add_response("describe_images", {"Images": [image]}, {"ImageIds": ["ami-0002"]})
+        result = ami.describe_images_batched(client, ["ami-0001", "ami-0002"])
+        stubber.assert_no_pending_responses()
+    assert list(result) == ["ami-0002"]
+
+
+def test_describe_images_batched_raises_other_errors():
+    client = _ec2_client()
+    with Stubber(client) as stubber:
+        stubber.add_client_error("describe_images", service_error_code="UnauthorizedOperation")
+        with pytest.raises(ami.botocoreClientError):
+            ami.describe_images_batched(client, ["ami-0001"])
+
+
+def test_get_ubuntu_quickstart_listings():
+    client = _ec2_client()
+    quickstart_list = {
+        "amiList": [
+            {"platform": "amazon", "imageId64": "ami-aaaa"},
+            {"platform": "ubuntu", "title": "Ubuntu 20.04", "imageId64": "ami-0001", "imageIdArm64": "ami-0002"},
+        ]
+    }
+    images = [
+        _canonical_image("ami-0001", "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-amd64-server-20201026"),
+        _canonical_image("ami-0002", "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-arm64-server-20201026"),
+    ]
+    with Stubber(client) as stubber:
+        stubber.add_response("describe_images", {"Images": images}, {"ImageIds": ["ami-0001", "ami-0002"]})
+        listings = ami.get_ubuntu_quickstart_listings("us-east-1", client, quickstart_list)
+    assert [(listing["ami_id"], listing["listing_arch"], listing["arch"]) for listing in listings] == [
+        ("ami-0001", "amd64", "amd64"),
+        ("ami-0002", "arm64", "arm64"),
+    ]
+    assert listings[0]["quickstart_slot"] == 2
+    assert listings[0]["owner"] == "Canonical"
+    assert listings[0]["release_version"] == "20.04"
+    assert listings[0]["serial"] == "20201026"
+
+
+def test_parse_ami_name_unknown_owner():
+    assert names.parse_ami_name({"ImageId": "ami-0001", "OwnerId": "123456789012", "Name": "x"}) is None
+
+
+def test_ami_cache_round_trip(tmp_path):
+    ami_cache = cache.AmiCache(str(tmp_path / "ami-cache.sqlite"))
+    image = _canonical_image("ami-0001", "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-amd64-server-20201026")
+    ami_cache.put_many("us-east-1", {"ami-0001": (image, names.parse_ami_name(image))})
+    assert ami_cache.get_many("eu-west-1", ["ami-0001"]) == {}
+    cached_image, (owner, attrs) = ami_cache.get_many("us-east-1", ["ami-0001"])["ami-0001"]
+    assert cached_image == image
+    assert owner == "Canonical"
+    assert attrs["serial"] == "20201026"
+    ami_cache.close()
+
+
+def test_ami_cache_evicts_old_and_excess_entries(tmp_path):
+    ami_cache = cache.AmiCache(str(tmp_path / "ami-cache.sqlite"), max_entries=1)
+    image = _canonical_image("ami-0001", "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-amd64-server-20201026")
+    ami_cache.put_many("us-east-1", {"ami-0001": (image, None), "ami-0002": (image, None)})
+    ami_cache.evict()
+    assert len(ami_cache.get_many("us-east-1", ["ami-0001", "ami-0002"])) == 1
+    ami_cache.max_age = -1
+    ami_cache.evict()
+    ami_cache.max_age = cache.AMI_CACHE_MAX_AGE
+    assert ami_cache.get_many("us-east-1", ["ami-0001", "ami-0002"]) == {}
+    ami_cache.close()
+
+
+def test_get_ubuntu_quickstart_listings_uses_ami_cache(tmp_path):
+    ami_cache = cache.AmiCache(str(tmp_path / "ami-cache.sqlite"))
+    image = _canonical_image("ami-0001", "ubuntu/images/hvm-ssd/ubuntu-focal-20.04-amd64-server-20201026")
+    ami_cache.put_many("us-east-1", {"ami-0001": (image, names.parse_ami_name(image))})
+    quickstart_list = {"amiList": [{"platform": "ubuntu", "imageId64": "ami-0001"}]}
+    client = _ec2_client()
+    with Stubber(client) as stubber:
+        listings = ami.get_ubuntu_quickstart_listings("us-east-1", client, quickstart_list, ami_cache)
+        stubber.assert_no_pending_responses()
+    assert listings[0]["ami_id"] == "ami-0001"
+    assert listings[0]["owner"] == "Canonical"
+    ami_cache.close()
+
+
+class _FakeRequest:
+    def __init__(self, path, response=None):
+        self.path = path
+        self.response = response
+
+
+class _FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+
+class _FakeDriver:
+    def __init__(self, requests_per_poll):
+        self._requests_per_poll = iter(requests_per_poll)
+        self.polls = 0
+
+    @property
+    def requests(self):
+        self.polls = self.polls + 1
+        return next(self._requests_per_poll, [])
+
+
+def test_wait_for_response_returns_once_response_arrives():
+    pending = _FakeRequest("https://console.aws.amazon.com/ec2/ecb?call=getQuickstartList")
+    done = _FakeRequest(pending.path, response="response")
+    driver = _FakeDriver([[], [pending], [_FakeRequest("/other", "response"), done]])
+    request = browser.wait_for_response(driver, browser.QUICKSTART_LIST_CALL, 5, 0.01)
+    assert request is done
+    assert driver.polls == 3
+
+
+def test_wait_for_response_times_out():
+    with pytest.raises(browser.SeleniumTimeoutException):
+        browser.wait_for_response(_FakeDriver([]), browser.QUICKSTART_LIST_CALL, 0.05, 0.01)
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.quit_called = False
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+class _FakeBrowserSessionPool(browser.BrowserSessionPool):
+    def __init__(self, size):
+        super().__init__(size, "123456789012", "username", "password", True)
+        self.started = []
+
+    def _start_driver(self):
+        driver = _FakeBrowser()
+        self.started.append(driver)
+        return driver
+
+
+def test_browser_session_pool_reuses_sessions():
+    with _FakeBrowserSessionPool(2) as browser_pool:
+        with browser_pool.session() as first_driver:
+            with browser_pool.session() as second_driver:
+                assert first_driver is not second_driver
+        with browser_pool.session() as driver:
+            assert driver in (first_driver, second_driver)
+        assert len(browser_pool.started) == 2
+    assert first_driver.quit_called and second_driver.quit_called
+
+
+def test_browser_session_pool_replaces_failed_sessions():
+    browser_pool = _FakeBrowserSessionPool(1)
+    with pytest.raises(browser.SeleniumTimeoutException):
+        with browser_pool.session():
+            raise browser.SeleniumTimeoutException("slow region")
+    with pytest.raises(browser.WebDriverException):
+        with browser_pool.session():
+            raise browser.WebDriverException("browser crashed")
+    assert browser_pool.started[0].quit_called
+    with browser_pool.session() as driver:
+        assert driver is browser_pool.started[1]
+    browser_pool.close()
+
+
+def test_browser_session_pool_blocks_assets():
+    preferences = _FakeBrowserSessionPool(1).driver_options.preferences
+    assert preferences["permissions.default.image"] == 2
+    unblocked_pool = browser.BrowserSessionPool(1, "123456789012", "username", "password", True, block_assets=False)
+    assert "permissions.default.image" not in unblocked_pool.driver_options.preferences
+
+
+def test_quickstart_capture_scopes():
+    def in_scope(path):
+        return any(re.search(scope, path) for scope in browser.QUICKSTART_CAPTURE_SCOPES)
+
+    assert in_scope("https://us-east-1.console.aws.amazon.com/ec2/ecb?call=getQuickstartList&region=us-east-1")
+    assert not in_scope("https://us-east-1.console.aws.amazon.com/ec2/ecb?call=getInstances")
+    assert not in_scope("https://a.b.cdn.console.awsstatic.com/logo.png")
+
+
+def test_quickstart_checkpoint_resume(tmp_path):
+    quickstart_checkpoint = checkpoint.QuickstartCheckpoint(str(tmp_path / "quickstart_checkpoint.ndjson"))
+    quickstart_checkpoint.reset()
+    quickstart_checkpoint.append("us-east-1", [{"ami_id": "ami-0001"}], 1.5, None)
+    quickstart_checkpoint.append("eu-west-1", [], None, "SeleniumTimeoutException: timed out")
+    with open(quickstart_checkpoint.path, "a") as checkpoint_file:
+        # A record cut short when the run was killed
+        checkpoint_file.write('{"region": "ap-south-1", "listi\n')
+        # --ndjson-out records written over the checkpoint
+        checkpoint_file.write('{"region":"ap-south-1","ami_id":"ami-0003"}\n')
+        checkpoint_file.write('{"ami_id":"ami-0004"}')
+    assert quickstart_checkpoint.completed_regions() == {"us-east-1"}
+
+    quickstart_checkpoint = checkpoint.QuickstartCheckpoint(quickstart_checkpoint.path)
+    quickstart_checkpoint.append("eu-west-1", [{"ami_id": "ami-0002"}], 2.0, None)
+    assert quickstart_checkpoint.completed_regions() == {"us-east-1", "eu-west-1"}
+    assert quickstart_checkpoint.results(["eu-west-1", "us-east-1", "ap-south-1"]) == [
+        ("eu-west-1", [{"ami_id": "ami-0002"}], 2.0, None),
+        ("us-east-1", [{"ami_id": "ami-0001"}], 1.5, None),
+    ]
+    quickstart_checkpoint.reset()
+    assert quickstart_checkpoint.completed_regions() == set()
+
+
+def test_available_memory(tmp_path):
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text("MemTotal:       16318436 kB\nMemFree:         1227044 kB\nMemAvailable:    8192000 kB\n")
+    assert browser.available_memory(str(meminfo)) == 8192000 * 1024
+    assert browser.available_memory(str(tmp_path / "missing")) is None
+
+
+def test_browser_session_count():
+    gigabyte = 1024 * 1024 * 1024
+    assert browser.browser_session_count(600, memory=4 * gigabyte) == 6
+    assert browser.browser_session_count(600, max_sessions=4, memory=4 * gigabyte) == 4
+    # A browser is always started even when memory is short
+    assert browser.browser_session_count(600, memory=gigabyte // 4) == 1
+    # Shared between the workers on one host
+    assert browser.browser_session_count(600, memory=4 * gigabyte, processes=3) == 2
+    assert browser.browser_session_count(600, memory=gigabyte, processes=3) == 1
+
+
+def test_quicklaunch_replay(tmp_path, monkeypatch):
+    fixtures_dir = os.path.join(os.path.dirname(__file__), "fixtures")
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(
+        quicklaunch.quicklaunch,
+        [
+            "--replay", fixtures_dir,
+            "--ami-metadata", os.path.join(fixtures_dir, "describe_images"),
+            "--no-ami-cache",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "browser process" not in result.output
+    with open("quickstart_entries.json") as quickstart_entries_json:
+        quickstart_entries = json.load(quickstart_entries_json)
+    assert [region for region, listings in quickstart_entries] == ["eu-west-1", "us-east-1"]
+    assert all(listings for region, listings in quickstart_entries)
+
+
+def test_quicklaunch_rejects_ndjson_out_over_checkpoint(tmp_path, monkeypatch):
+    fixtures_dir = os.path.join(os.path.dirname(__file__), "fixtures")
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(
+        quicklaunch.quicklaunch,
+        [
+            "--replay", fixtures_dir,
+            "--checkpoint", "quickstart.ndjson",
+            "--ndjson-out", "./quickstart.ndjson",
+        ],
+    )
+    assert result.exit_code == 2
+    assert "--checkpoint" in result.output
+    assert not os.path.exists("quickstart.ndjson")
+
+
+def test_ec2_client_factory_shares_one_session(monkeypatch):
+    sessions = []
+    boto3_session = boto3.Session
+
+    def session():
+        sessions.append(boto3_session())
+        return sessions[-1]
+
+    monkeypatch.setattr(quicklaunch.boto3, "Session", session)
+    ec2_client_factory = quicklaunch.Ec2ClientFactory(max_pool_connections=2)
+    us_east_1_client = ec2_client_factory("us-east-1")
+    eu_west_1_client = ec2_client_factory("eu-west-1")
+    assert ec2_client_factory("us-east-1") is us_east_1_client
+    assert len(sessions) == 1
+    assert eu_west_1_client.meta.region_name == "eu-west-1"
+    assert eu_west_1_client.meta.config.retries["mode"] == "adaptive"
+    assert eu_west_1_client.meta.config.max_pool_connections == 2
+
+
+def test_scrape_quicklaunch_records_browser_failures_per_region(tmp_path, monkeypatch):
+    fixtures_dir = os.path.join(os.path.dirname(__file__), "fixtures")
+    monkeypatch.chdir(tmp_path)
+
+    def capture_quickstart_list(driver, browser_pool, region_identifier, capture_timeout, capture_poll_interval):
+        if region_identifier == "eu-west-1":
+            raise browser.WebDriverException("browser crashed")
+        if region_identifier == "ap-south-1":
+            return (1.0, _FakeRequest("", _FakeResponse(b"<html>Signed out</html>")))
+        with open(os.path.join(fixtures_dir, "{}-getQuickstartList.json".format(region_identifier)), "rb") as payload:
+            return (1.0, _FakeRequest("", _FakeResponse(payload.read())))
+
+    monkeypatch.setattr(quicklaunch, "capture_quickstart_list", capture_quickstart_list)
+    with _FakeBrowserSessionPool(2) as browser_pool:
+        results = {
+            region: (listings, error)
+            for region, listings, capture_time, error in quicklaunch.scrape_quicklaunch(
+                browser_pool,
+                [{"id": "us-east-1"}, {"id": "eu-west-1"}, {"id": "ap-south-1"}],
+                False,
+                None,
+                1,
+                0.1,
+                region_client_factory=ami.RecordedEc2Client.factory(os.path.join(fixtures_dir, "describe_images")),
+            )
+        }
+    assert results["us-east-1"][0] and results["us-east-1"][1] is None
+    assert results["eu-west-1"] == ([], "WebDriverException: browser crashed")
+    assert results["ap-south-1"][1].startswith("ValueError")
+
+
+def test_quicklaunch_replay_records_malformed_payloads_per_region(tmp_path, monkeypatch):
+    fixtures_dir = os.path.join(os.path.dirname(__file__), "fixtures")
+    payload_dir = tmp_path / "payloads"
+    payload_dir.mkdir()
+    shutil.copy(os.path.join(fixtures_dir, "us-east-1-getQuickstartList.json"), str(payload_dir))
+    (payload_dir / "eu-west-1-getQuickstartList.json").write_text('{"error": "Session expired"}')
+    (payload_dir / "ap-south-1-getQuickstartList.json").write_text('{"amiList": [{"title": "No platform"}]}')
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(
+        quicklaunch.quicklaunch,
+        [
+            "--replay", str(payload_dir),
+            "--ami-metadata", os.path.join(fixtures_dir, "describe_images"),
+            "--no-ami-cache",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    records = checkpoint.QuickstartCheckpoint().records()
+    assert records["us-east-1"]["listings"] and records["us-east-1"]["error"] is None
+    assert records["eu-west-1"]["error"] == "ValueError: call=getQuickstartList response has no amiList"
+    assert records["ap-south-1"]["error"] == "KeyError: 'platform'"
+
+
+class _NoCredentialsEc2Client:
+    def describe_images(self, ImageIds):
+        raise botocore.exceptions.NoCredentialsError()
+
+
+def test_scrape_quicklaunch_records_boto_core_errors_per_region(tmp_path, monkeypatch):
+    fixtures_dir = os.path.join(os.path.dirname(__file__), "fixtures")
+    monkeypatch.chdir(tmp_path)
+    recorded_ec2_client = ami.RecordedEc2Client.factory(os.path.join(fixtures_dir, "describe_images"))
+    results = {
+        region: (listings, error)
+        for region, listings, capture_time, error in quicklaunch.scrape_quicklaunch(
+            None,
+            [{"id": "us-east-1"}, {"id": "eu-west-1"}],
+            False,
+            None,
+            1,
+            0.1,
+            quickstart_lists=quicklaunch.load_quickstart_payloads(
+                fixtures_dir, [{"id": "us-east-1"}, {"id": "eu-west-1"}]
+            ),
+            region_client_factory=lambda region: (
+                _NoCredentialsEc2Client() if region == "eu-west-1" else recorded_ec2_client(region)
+            ),
+        )
+    }
+    assert results["us-east-1"][0] and results["us-east-1"][1] is None
+    assert results["eu-west-1"] == ([], "NoCredentialsError: Unable to locate credentials")
+
+
+def test_fetch_quickstart_lists_direct_survives_browser_failure(monkeypatch):
+    def capture_quickstart_list(*args):
+        raise browser.WebDriverException("browser crashed")
+
+    monkeypatch.setattr(quicklaunch, "capture_quickstart_list", capture_quickstart_list)
+    with _FakeBrowserSessionPool(1) as browser_pool:
+        assert quicklaunch.fetch_quickstart_lists_direct(browser_pool, [{"id": "us-east-1"}], 1, 0.1) == {}
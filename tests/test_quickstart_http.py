@@ -0,0 +1,86 @@
+import json
+import os
+
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from aws_marketplace_ubuntu_scraper import quickstart_http
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+SESSION_COOKIE = "aws-creds=signed-in"
+
+
+class _ConsoleHandler(BaseHTTPRequestHandler):
+    """Stand in for the console serving recorded getQuickstartList payloads."""
+
+    def do_POST(self):
+        query = parse_qs(urlparse(self.path).query)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        region = query["region"][0]
+        payload_path = os.path.join(FIXTURES_DIR, "{}-getQuickstartList.json".format(region))
+        if self.headers.get("Cookie") != SESSION_COOKIE:
+            self.send_response(403)
+            self.end_headers()
+        elif body.get("region") != region or not os.path.exists(payload_path):
+            self.send_response(404)
+            self.end_headers()
+        else:
+            with open(payload_path, "rb") as payload:
+                content = payload.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def console_url(http_server):
+    return "{}/ec2/ecb".format(http_server(_ConsoleHandler))
+
+
+class _CapturedRequest:
+    def __init__(self, console_url, cookie):
+        self.method = "POST"
+        self.path = "{}?call=getQuickstartList&region=us-east-1".format(console_url)
+        self.headers = {
+            "Host": "console.aws.amazon.com",
+            "Cookie": cookie,
+            "Content-Type": "application/json",
+            "Content-Length": "24",
+        }
+        self.body = b'{"region": "us-east-1"}'
+
+
+def test_fetch_many_replays_captured_request_for_each_region(console_url):
+    client = quickstart_http.QuickstartListClient.from_captured_request(
+        _CapturedRequest(console_url, SESSION_COOKIE), "us-east-1"
+    )
+    quickstart_lists = client.fetch_many(["us-east-1", "eu-west-1"])
+    client.close()
+    with open(os.path.join(FIXTURES_DIR, "eu-west-1-getQuickstartList.json")) as payload:
+        assert quickstart_lists["eu-west-1"][1] == json.load(payload)
+    assert sorted(quickstart_lists) == ["eu-west-1", "us-east-1"]
+
+
+def test_fetch_many_leaves_out_failed_regions(console_url):
+    client = quickstart_http.QuickstartListClient.from_captured_request(
+        _CapturedRequest(console_url, SESSION_COOKIE), "us-east-1"
+    )
+    assert sorted(client.fetch_many(["eu-west-1", "ap-south-1"])) == ["eu-west-1"]
+    client.close()
+
+
+def test_fetch_raises_when_session_is_rejected(console_url):
+    client = quickstart_http.QuickstartListClient.from_captured_request(
+        _CapturedRequest(console_url, "aws-creds=expired"), "us-east-1"
+    )
+    with pytest.raises(requests.RequestException):
+        client.fetch("eu-west-1")
+    client.close()
@@ -0,0 +1,94 @@
+import json
+import os
+
+import boto3
+import pytest
+
+from botocore.stub import Stubber
+
+from aws_marketplace_ubuntu_scraper import regions
+
+
+def _region_client_factory(stubber_responses):
+    def region_client_factory(region_identifier):
+        client = boto3.client(
+            "ec2", region_name=region_identifier, aws_access_key_id="test", aws_secret_access_key="test"
+        )
+        stubber = Stubber(client)
+        for method, response in stubber_responses:
+            if isinstance(response, dict):
+                stubber.add_response(method, response)
+            else:
+                stubber.add_client_error(method, response)
+        stubber.activate()
+        return client
+
+    return region_client_factory
+
+
+def _no_browser():
+    raise AssertionError("The browser should not be used")
+
+
+def test_known_only_regions_skip_discovery(tmp_path):
+    cache_path = str(tmp_path / "regions.json")
+    assert regions.discover_regions(
+        ["eu-west-1", "us-east-1"], _no_browser, _no_browser, cache_path=cache_path
+    ) == [
+        {"name": "Europe", "location": "Ireland", "id": "eu-west-1"},
+        {"name": "US East", "location": "N. Virginia", "id": "us-east-1"},
+    ]
+    assert not os.path.exists(cache_path)
+
+
+def test_discover_regions_describes_and_caches_enabled_regions(tmp_path):
+    cache_path = str(tmp_path / "regions.json")
+    region_client_factory = _region_client_factory(
+        [
+            (
+                "describe_regions",
+                {
+                    "Regions": [
+                        {"RegionName": "us-east-1", "OptInStatus": "opt-in-not-required"},
+                        {"RegionName": "ap-east-1", "OptInStatus": "opted-in"},
+                    ]
+                },
+            )
+        ]
+    )
+    discovered = regions.discover_regions(
+        (), region_client_factory, _no_browser, cache_path=cache_path
+    )
+    assert [region["id"] for region in discovered] == ["ap-east-1", "us-east-1"]
+    assert discovered[0] == {"name": "Asia Pacific", "location": "Hong Kong", "id": "ap-east-1"}
+    with open(cache_path) as region_cache_file:
+        assert json.load(region_cache_file) == discovered
+
+    # Served from the cache, without calling EC2 again
+    assert regions.discover_regions(
+        ["us-east-1", "xx-new-1"], _no_browser, _no_browser, cache_path=cache_path
+    ) == [discovered[1]]
+    # Known regions are checked against the cached regions, skipping those
+    # the account has not opted in to
+    assert regions.discover_regions(
+        ["us-east-1", "af-south-1"], _no_browser, _no_browser, cache_path=cache_path
+    ) == [discovered[1]]
+
+
+def test_discover_regions_falls_back_to_the_browser(tmp_path):
+    cache_path = str(tmp_path / "regions.json")
+    regions.save_cached_regions([regions.region_dict("us-east-1")], cache_path)
+    browser_regions = [{"name": "US East", "location": "N. Virginia", "id": "us-east-1", "extra": True}]
+    # The cache has expired and EC2 is not allowed to list the regions
+    discovered = regions.discover_regions(
+        (),
+        _region_client_factory([("describe_regions", "UnauthorizedOperation")]),
+        lambda: browser_regions,
+        cache_path=cache_path,
+        cache_ttl=0,
+    )
+    assert discovered == browser_regions
+    assert regions.load_cached_regions(cache_path) == browser_regions
+
+    with pytest.raises(RuntimeError):
+        regions.discover_regions((), cache_path=str(tmp_path / "missing.json"))
@@ -0,0 +1,128 @@
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from aws_marketplace_ubuntu_scraper import output, quicklaunch, report, streams
+
+STREAMS_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "streams", "released-aws.json")
+
+
+def _listing(release_version, listing_arch, ami_id, slot):
+    image_id_key = "imageId64" if listing_arch == "amd64" else "imageIdArm64"
+    return {
+        "owner": "Canonical",
+        "release_version": release_version,
+        "listing_arch": listing_arch,
+        "quickstart_slot": slot,
+        image_id_key: ami_id,
+    }
+
+
+def test_streams_index_returns_latest_image():
+    streams_index = streams.StreamsIndex.load(STREAMS_PATH)
+    assert streams_index.get_image("us-east-1", "20.04", "amd64") == "ami-0dba2cb6798deb6d8"
+    assert streams_index.get_image("eu-west-1", "16.04", "arm64") == "ami-0c0bbf4e2f1b9aa1e"
+    assert streams_index.get_image("eu-west-1", "16.04", "amd64", "pv", "instance") != (
+        streams_index.get_image("eu-west-1", "16.04", "amd64")
+    )
+    assert streams_index.get_image("ap-south-1", "20.04", "amd64") is None
+
+
+def test_streams_index_inherits_fields_and_reads_signed_documents(tmp_path):
+    streams_data = {
+        "arch": "amd64",
+        "products": {
+            "com.ubuntu.cloud:server:20.04:amd64": {
+                "version": "20.04",
+                "versions": {
+                    "20201026": {"items": {"usee1hs": {"crsn": "us-east-1", "id": "ami-1", "virt": "hvm", "root_store": "ssd"}}}
+                },
+            }
+        },
+    }
+    signed_path = tmp_path / "released-aws.sjson"
+    signed_path.write_text(
+        "-----BEGIN PGP SIGNED MESSAGE-----\nHash: SHA512\n\n{}\n"
+        "-----BEGIN PGP SIGNATURE-----\n\nsignature\n-----END PGP SIGNATURE-----\n".format(json.dumps(streams_data))
+    )
+    streams_index = streams.StreamsIndex.load("file://{}".format(signed_path))
+    assert streams_index.get_image("us-east-1", "20.04", "amd64") == "ami-1"
+
+
+    # A mirror with only the signed document
+    mirror_streams_dir = tmp_path / "mirror" / "streams" / "v1"
+    mirror_streams_dir.mkdir(parents=True)
+    signed_path.rename(mirror_streams_dir / "com.ubuntu.cloud:released:aws.sjson")
+    streams_index = streams.StreamsIndex.load(str(tmp_path / "mirror"))
+    assert streams_index.get_image("us-east-1", "20.04", "amd64") == "ami-1"
+
+
+def test_streams_index_loads_mirror_directory(tmp_path):
+    mirror_streams_dir = tmp_path / "streams" / "v1"
+    mirror_streams_dir.mkdir(parents=True)
+    with pytest.raises(FileNotFoundError):
+        streams.StreamsIndex.load(str(tmp_path))
+    with open(STREAMS_PATH) as streams_file:
+        (mirror_streams_dir / "com.ubuntu.cloud:released:aws.json").write_text(streams_file.read())
+    streams_index = streams.StreamsIndex.load(str(tmp_path))
+    assert streams_index.get_image("us-east-1", "20.04", "amd64") == "ami-0dba2cb6798deb6d8"
+
+
+def test_quicklaunch_report_flags_outdated_listings(tmp_path):
+    scraper_data = tmp_path / "quickstart_entries.json"
+    scraper_data.write_text(
+        json.dumps(
+            [
+                ["us-east-1", [
+                    _listing("20.04", "amd64", "ami-0dba2cb6798deb6d8", 3),
+                    _listing("18.04", "amd64", "ami-0817d428a6fb68645", 4),
+                ]],
+                ["eu-west-1", [_listing("20.04", "arm64", "ami-0f25d1b5e8a8ba4a8", 2)]],
+            ]
+        )
+    )
+    result = CliRunner().invoke(
+        report.quicklaunch_report,
+        ["--scraper-data", str(scraper_data), "--streams", STREAMS_PATH, "--needs-update-only"],
+    )
+    assert result.exit_code == 2
+    assert "ami-0885b1f6bd170450c" in result.output
+    assert "ami-0dba2cb6798deb6d8" not in result.output
+    assert "Checking region eu-west-1" in result.output
+
+
+def test_quicklaunch_report_up_to_date(tmp_path):
+    scraper_data = tmp_path / "quickstart_entries.json"
+    scraper_data.write_text(
+        json.dumps([["us-east-1", [_listing("20.04", "amd64", "ami-0dba2cb6798deb6d8", 3)]]])
+    )
+    result = CliRunner().invoke(
+        report.quicklaunch_report, ["--scraper-data", str(scraper_data), "--streams", STREAMS_PATH]
+    )
+    assert result.exit_code == 0
+    assert "No updates needed" in result.output
+
+
+def test_quicklaunch_report_reads_gzipped_ndjson(tmp_path):
+    ndjson_path = str(tmp_path / "quickstart_entries.ndjson.gz")
+    listing = dict(_listing("20.04", "amd64", "ami-0dba2cb6798deb6d8", 3), description="Ubuntu Server")
+    record_count = output.write_ndjson(
+        ndjson_path,
+        output.quickstart_records([("eu-west-1", [listing]), ("us-east-1", [listing])]),
+        ["ami_id"],
+        keep_fields=quicklaunch.QUICKSTART_REPORT_FIELDS,
+    )
+    assert record_count == 2
+    with open(ndjson_path, "rb") as ndjson_file:
+        records = list(output.read_quickstart_records(ndjson_file))
+    assert [region for region, record in records] == ["eu-west-1", "us-east-1"]
+    assert "description" not in records[0][1]
+
+    result = CliRunner().invoke(
+        report.quicklaunch_report, ["--scraper-data", ndjson_path, "--streams", STREAMS_PATH]
+    )
+    assert result.exit_code == 2
+    assert "Checking region eu-west-1" in result.output
+    assert "ami-0dba2cb6798deb6d8" in result.output
@@ -0,0 +1,139 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from click.testing import CliRunner
+
+from aws_marketplace_ubuntu_scraper import sharding
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGIONS = [{"id": "us-east-1"}, {"id": "eu-west-1"}, {"id": "ap-south-1"}]
+
+
+def test_shard_queue_claims_each_shard_once(tmp_path):
+    shard_queue = sharding.ShardQueue(str(tmp_path))
+    assert shard_queue.create(REGIONS, shard_size=2) == ["shard-0001.json", "shard-0002.json"]
+    other_worker_queue = sharding.ShardQueue(str(tmp_path))
+
+    first_shard = shard_queue.claim("worker-1")
+    second_shard = other_worker_queue.claim("worker-2")
+    assert first_shard.regions == REGIONS[:2]
+    assert second_shard.regions == REGIONS[2:]
+    assert shard_queue.claim("worker-1") is None
+
+    shard_queue.complete(first_shard, [("us-east-1", [], 1.0, None), ("eu-west-1", [], 2.0, None)])
+    assert shard_queue.unfinished() == ["shard-0002.json"]
+    other_worker_queue.complete(second_shard, [("ap-south-1", [], None, "timed out")])
+    assert shard_queue.unfinished() == []
+    assert sorted(result[0] for result in shard_queue.results()) == ["ap-south-1", "eu-west-1", "us-east-1"]
+
+
+def test_shard_queue_requeues_stale_claims(tmp_path):
+    shard_queue = sharding.ShardQueue(str(tmp_path))
+    shard_queue.create(REGIONS, shard_size=3)
+    shard = shard_queue.claim("worker-1")
+    assert shard_queue.requeue_stale(claim_timeout=60) == []
+    assert shard_queue.requeue_stale(claim_timeout=-1) == ["shard-0001.json"]
+
+    requeued_shard = shard_queue.claim("worker-2")
+    assert requeued_shard.regions == REGIONS
+    # The worker the shard was taken from finishing late is harmless
+    shard_queue.complete(shard, [])
+    shard_queue.complete(requeued_shard, [("us-east-1", [], 1.0, None)])
+    assert shard_queue.results() == [("us-east-1", [], 1.0, None)]
+
+
+def test_shard_queue_claim_survives_requeued_claim(tmp_path, monkeypatch):
+    shard_queue = sharding.ShardQueue(str(tmp_path))
+    shard_queue.create(REGIONS, shard_size=2)
+    read = shard_queue._read
+
+    def requeued_before_read(path):
+        # Another worker's claim of the first shard is requeued and claimed
+        # again between the rename and the read
+        if path.endswith("worker-1") and "shard-0001" in path:
+            os.remove(path)
+        return read(path)
+
+    monkeypatch.setattr(shard_queue, "_read", requeued_before_read)
+    assert shard_queue.claim("worker-1").name == "shard-0002.json"
+
+
+def test_worker_claims_shards_requeued_from_a_dead_worker(tmp_path, monkeypatch):
+    monkeypatch.chdir(str(tmp_path))
+    shard_queue = sharding.ShardQueue(str(tmp_path / "queue"))
+    shard_queue.create([{"id": "us-east-1"}])
+    assert shard_queue.claim("dead-worker").name == "shard-0001.json"
+    requeue = threading.Timer(0.5, shard_queue.requeue_stale, kwargs={"claim_timeout": -1})
+    requeue.start()
+    try:
+        result = CliRunner().invoke(
+            sharding.quicklaunch_worker,
+            [
+                "--queue-dir", str(tmp_path / "queue"),
+                "--worker-id", "worker-1",
+                "--payload-dir", FIXTURES_DIR,
+                "--ami-metadata", os.path.join(FIXTURES_DIR, "describe_images"),
+                "--no-ami-cache",
+                "--poll-interval", "0.1",
+            ],
+        )
+    finally:
+        requeue.join()
+    assert result.exit_code == 0, result.output
+    assert "worker-1 - Completed shard-0001.json" in result.output
+    assert shard_queue.unfinished() == []
+
+
+def _scraper_process(cwd, *args):
+    os.makedirs(cwd, exist_ok=True)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([PROJECT_DIR, os.environ.get("PYTHONPATH", "")]))
+    return subprocess.Popen(
+        [sys.executable, "-m", "aws_marketplace_ubuntu_scraper"] + list(args),
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+
+
+def test_coordinator_merges_worker_results(tmp_path):
+    queue_dir = str(tmp_path / "queue")
+    coordinator = _scraper_process(
+        str(tmp_path),
+        "quicklaunch-coordinator",
+        "--queue-dir", queue_dir,
+        "--only-regions", "us-east-1",
+        "--only-regions", "eu-west-1",
+        "--shard-size", "1",
+        "--poll-interval", "0.1",
+        "--timeout", "60",
+    )
+    workers = [
+        _scraper_process(
+            str(tmp_path / worker_id),
+            "quicklaunch-worker",
+            "--queue-dir", queue_dir,
+            "--worker-id", worker_id,
+            "--payload-dir", FIXTURES_DIR,
+            "--ami-metadata", os.path.join(FIXTURES_DIR, "describe_images"),
+            "--no-ami-cache",
+        )
+        for worker_id in ("worker-1", "worker-2")
+    ]
+    for worker in workers:
+        output = worker.communicate(timeout=60)[0]
+        assert worker.returncode == 0, output
+    output = coordinator.communicate(timeout=60)[0]
+    assert coordinator.returncode == 0, output
+
+    with open(str(tmp_path / "quickstart_entries.json")) as quickstart_entries_json:
+        quickstart_entries = json.load(quickstart_entries_json)
+    assert [region for region, listings in quickstart_entries] == ["eu-west-1", "us-east-1"]
+    assert {"ami-0dba2cb6798deb6d8", "ami-0ea142bd244023692"} <= {
+        listing["ami_id"] for listing in quickstart_entries[1][1]
+    }
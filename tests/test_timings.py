@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from aws_marketplace_ubuntu_scraper import marketplace, timing
+
+
+def test_timings_report_summarises_phases():
+    timings = timing.Timings("quicklaunch")
+    timings.record("describe_images", 1.5, region="us-east-1")
+    timings.record("describe_images", 0.5, region="eu-west-1")
+    with timings.span("get_regions"):
+        pass
+
+    report = timings.report()
+    assert report["command"] == "quicklaunch"
+    assert len(report["spans"]) == 3
+    assert report["phases"]["describe_images"] == {"count": 2, "total": 2.0, "max": 1.5}
+    assert report["phases"]["get_regions"]["count"] == 1
+
+
+def test_timings_span_records_failed_phases():
+    timings = timing.Timings("quicklaunch")
+    try:
+        with timings.span("region", region="us-east-1"):
+            raise ValueError("capture failed")
+    except ValueError:
+        pass
+    assert [span["phase"] for span in timings.report()["spans"]] == ["region"]
+
+
+def test_timings_is_thread_safe():
+    timings = timing.Timings("marketplace")
+
+    def record():
+        for _ in range(1000):
+            timings.record("http_request", 0.001)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert timings.report()["phases"]["http_request"]["count"] == 8000
+
+
+def test_timings_write(tmp_path):
+    timings = timing.Timings("quicklaunch")
+    timings.record("quickstart_capture", 2.0, region="us-east-1", attempt=1)
+    timings.record("quickstart_capture", 1.0, region="us-east-1", attempt=2)
+    timings.record("browser_start", 4.0)
+    metrics_path = str(tmp_path / "metrics.json")
+    timings.write(metrics_path)
+
+    with open(metrics_path) as metrics_file:
+        assert len(json.load(metrics_file)["spans"]) == 3
+    assert not os.path.exists(str(tmp_path / "metrics.prom.tmp"))
+    with open(str(tmp_path / "metrics.prom")) as prometheus_file:
+        prometheus = prometheus_file.read()
+    metric = "aws_marketplace_ubuntu_scraper_phase_duration_seconds"
+    # Labels other than the phase and region are left out of the metrics
+    # to keep their cardinality down.
+    assert (
+        '{}_sum{{command="quicklaunch",phase="quickstart_capture",region="us-east-1"}} 3.0'.format(metric)
+        in prometheus
+    )
+    assert (
+        '{}_count{{command="quicklaunch",phase="quickstart_capture",region="us-east-1"}} 2'.format(metric)
+        in prometheus
+    )
+    assert '{}_count{{command="quicklaunch",phase="browser_start"}} 1'.format(metric) in prometheus
+    assert "aws_marketplace_ubuntu_scraper_last_run_timestamp_seconds" in prometheus
+
+
+def test_timed_without_timings():
+    with timing.timed(None, "region", region="us-east-1"):
+        pass
+
+
+def test_timings_write_rejects_prometheus_path(tmp_path):
+    with pytest.raises(ValueError):
+        timing.Timings("quicklaunch").write(str(tmp_path / "metrics.prom"))
+    assert not os.path.exists(str(tmp_path / "metrics.prom"))
+
+    result = CliRunner().invoke(marketplace.marketplace, ["--metrics-out", str(tmp_path / "metrics.prom")])
+    assert result.exit_code == 2
+    assert "--metrics-out" in result.output
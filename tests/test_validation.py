@@ -0,0 +1,63 @@
+import io
+import json
+
+from click.testing import CliRunner
+
+from aws_marketplace_ubuntu_scraper import cli, validation
+
+
+def _entry(release_version, arch, ami_id, slot, listing_arch=None, owner="Canonical"):
+    return {
+        "title": "Ubuntu Server {} LTS".format(release_version),
+        "owner": owner,
+        "release_version": release_version,
+        "arch": arch,
+        "listing_arch": listing_arch or arch,
+        "ami_id": ami_id,
+        "quickstart_slot": slot,
+    }
+
+
+QUICKSTART_ENTRIES = [
+    (
+        "us-east-1",
+        [
+            _entry("20.04", "amd64", "ami-0001", 2),
+            _entry("20.04", "arm64", "ami-0002", 2, listing_arch="amd64"),
+            _entry("18.04", "amd64", "ami-0003", 4),
+            _entry("18.04", "arm64", "ami-0004", 4),
+            _entry("16.04", "amd64", "ami-0001", 11),
+            _entry("16.04", "amd64", "ami-0009", 12, owner="amazon"),
+        ],
+    ),
+]
+
+
+def test_validate_quickstart_entries():
+    issues = validation.validate_quickstart_entries(QUICKSTART_ENTRIES)
+    assert [(issue["rule"], issue["message"]) for issue in issues] == [
+        ("arch_mismatch", "'Ubuntu Server 20.04 LTS' listing arch amd64 and AMI (ami-0002) arch arm64 are not equal "),
+        ("max_slot", "'Ubuntu Server 16.04 LTS' amd64 listing slot is greater than 10 - slot 11"),
+        ("duplicate", "'Ubuntu Server 16.04 LTS' amd64 listing AMI ami-0001 appears more than once  "),
+        ("missing_listing", "There are no listings for 16.04 arm64  "),
+    ]
+    assert issues[0]["region"] == "us-east-1"
+    assert issues[0]["ami_id"] == "ami-0002"
+    assert issues[-1]["release_version"] == "16.04"
+
+
+def test_validation_config_overrides_defaults():
+    config = validation.load_validation_config(
+        io.StringIO(json.dumps({"expected_listings": {"20.04": ["amd64"]}, "max_slot": 12, "rules": ["max_slot", "missing_listing"]}))
+    )
+    assert validation.validate_quickstart_entries(QUICKSTART_ENTRIES, config) == []
+
+
+def test_quicklaunch_validate_command(tmp_path):
+    scraper_data = tmp_path / "quickstart_entries.json"
+    scraper_data.write_text(json.dumps(QUICKSTART_ENTRIES))
+    result = CliRunner().invoke(
+        cli.main, ["quicklaunch-validate", "--scraper-data", str(scraper_data), "--json-output"]
+    )
+    assert result.exit_code == 2
+    assert len(json.loads(result.output)) == 4
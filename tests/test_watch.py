@@ -0,0 +1,68 @@
+import json
+import os
+
+from click.testing import CliRunner
+
+from aws_marketplace_ubuntu_scraper import watch
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def _listing(quickstart_slot, release_version, listing_arch, ami_id):
+    return {
+        "quickstart_slot": quickstart_slot,
+        "ami_id": ami_id,
+        "owner": "Canonical",
+        "release_version": release_version,
+        "listing_arch": listing_arch,
+        "description": "Ubuntu Server",
+    }
+
+
+def test_listings_hash_ignores_unwatched_fields():
+    listing = _listing(1, "20.04", "amd64", "ami-1")
+    assert watch.listings_hash([listing]) == watch.listings_hash([dict(listing, description="Ubuntu")])
+    assert watch.listings_hash([listing]) != watch.listings_hash([dict(listing, quickstart_slot=2)])
+
+
+def test_quickstart_changes():
+    previous_listings = [
+        _listing(1, "20.04", "amd64", "ami-1"),
+        _listing(2, "20.04", "arm64", "ami-2"),
+        _listing(3, "18.04", "amd64", "ami-3"),
+    ]
+    listings = [
+        _listing(1, "20.04", "amd64", "ami-4"),
+        _listing(3, "20.04", "arm64", "ami-2"),
+        _listing(4, "16.04", "amd64", "ami-5"),
+    ]
+    changes = watch.quickstart_changes("us-east-1", previous_listings, listings)
+    assert [(change["release_version"], change["listing_arch"], change["change"]) for change in changes] == [
+        ("16.04", "amd64", "listing_added"),
+        ("18.04", "amd64", "listing_removed"),
+        ("20.04", "amd64", "ami_changed"),
+        ("20.04", "arm64", "slot_moved"),
+    ]
+    assert changes[2]["previous_ami_id"] == "ami-1"
+    assert changes[2]["ami_id"] == "ami-4"
+    assert changes[3]["quickstart_slot"] == 3
+    assert watch.quickstart_changes("us-east-1", listings, listings) == []
+
+
+def test_quicklaunch_watch_only_prints_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # The saved payloads do not change between polls
+    result = CliRunner().invoke(
+        watch.quicklaunch_watch,
+        [
+            "--payload-dir", FIXTURES_DIR,
+            "--ami-metadata", os.path.join(FIXTURES_DIR, "describe_images"),
+            "--no-ami-cache",
+            "--polls", "2",
+            "--interval", "0",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "Poll 2 found 0 changes" in result.output
+    for line in result.output.splitlines():
+        assert not line.startswith("{") or json.loads(line)["change"]